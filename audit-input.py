@@ -7,35 +7,80 @@ client certs, and KVStore checkpointing based on event timestamps.
 """
 from __future__ import annotations
 
+import heapq
+import itertools
 import json
 import logging
+import signal
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
-
-from requests.auth import HTTPBasicAuth
-
-from solnlib import conf_manager, log
-from splunklib import modularinput as smi
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
 
 from Splunk_TA_Apigee_utils import (
+    ACCOUNT_CONF,
     ADDON_NAME,
+    HEC_ACK_TIMEOUT_SEC,
+    HEC_SENDERS,
+    LEASE_TTL_SEC,
+    PARSE_PARALLEL_MIN_BYTES,
+    SETTINGS_CONF,
+    SORT_BUFFER_MB,
+    AdaptiveRateLimiter,
+    BatchEventWriter,
+    DedupeIndex,
+    ExternalSorter,
+    HecError,
+    HecEventWriter,
+    HecSink,
+    CheckpointStore,
+    ConcurrencyLimiter,
+    IntervalScheduler,
+    LeaseCoordinator,
+    ParallelParser,
+    PhaseMetrics,
+    RawRecord,
+    RecordFilter,
+    SerializedEventWriter,
+    WindowTuner,
     build_cert_files,
     cleanup_temp_files,
+    compile_record_filter,
+    compile_record_scanner,
     default_start_ms,
-    extract_timestamp_from_event,
+    compile_timestamp_extractor,
     get_account_details,
-    get_checkpoint_manager,
+    get_checkpoint_state,
+    get_checkpoint_store,
+    get_conf_stanzas,
+    get_hec_sink,
     get_last_checkpoint_time,
+    get_log_level,
     get_proxy_settings,
+    get_rate_limiter,
     http_get_with_retry,
+    invalidate_conf_cache,
+    iter_in_background,
+    lazy_import,
+    make_json_encoder,
     now_ms,
     set_logger,
     to_epoch_ms_from_datestr,
+    to_positive_int,
     update_checkpoint,
     validate_start_date,
 )
 
+if TYPE_CHECKING:
+    from requests.auth import HTTPBasicAuth
+
+# Heavy dependencies load on first use, so scheme/validation calls stay fast.
+requests = lazy_import("requests")
+log = lazy_import("solnlib.log")
+smi = lazy_import("splunklib.modularinput")
+
 
 # ------------------------- Local helpers -------------------------
 
@@ -49,17 +94,88 @@ def _parse_timestamp_fields(fields_str: str) -> List[str]:
 
 
 def _load_settings_conf(session_key: str, logger: logging.Logger) -> Dict[str, Any]:
-    cm = conf_manager.ConfManager(session_key, ADDON_NAME)
     try:
-        conf = cm.get_conf("splunk_ta_apigee_settings")
+        stanzas = get_conf_stanzas(session_key, SETTINGS_CONF)
     except Exception:
         logger.debug("settings conf not found; using defaults")
         return {}
 
-    try:
-        return dict(conf.get("general"))
-    except Exception:
-        return {}
+    return dict(stanzas.get("general") or {})
+
+
+def _hec_sink(settings: Dict[str, Any]) -> Optional[HecSink]:
+    """Return the HEC sink when ``output_mode = hec`` in [general], else None (events go to stdout)."""
+    if str(settings.get("output_mode") or "stdout").strip().lower() != "hec":
+        return None
+    url, token = settings.get("hec_url"), settings.get("hec_token")
+    if not url or not token:
+        raise ValueError("output_mode is 'hec' but hec_url or hec_token is not set")
+    verify = str(settings.get("hec_validate_ssl", settings.get("validate_ssl", "true"))).lower() != "false"
+    return get_hec_sink(
+        url,
+        token,
+        verify_ssl=verify,
+        senders=to_positive_int(settings.get("hec_senders"), HEC_SENDERS),
+        ack_timeout_sec=float(to_positive_int(settings.get("hec_ack_timeout_sec"), int(HEC_ACK_TIMEOUT_SEC))),
+    )
+
+
+def _parse_resource_uris(value: Any) -> List[str]:
+    """Audit resources of an input: a JSON array or a comma-separated list, e.g. ``/developers, /apis``."""
+    text = str(value or "").strip()
+    if text.startswith("["):
+        items = json.loads(text)
+        if not isinstance(items, list):
+            raise ValueError("Audit EndPoint list must be a JSON array of strings")
+    else:
+        items = text.split(",")
+    uris: List[str] = []
+    for item in items:
+        uri = str(item).strip() or "/"
+        if uri not in uris:
+            uris.append(uri)
+    return uris or ["/"]
+
+
+def _endpoint_key(resource_uri: str) -> str:
+    """Checkpoint sub-key of one audit resource, e.g. ``/apis/x`` -> ``apis:x``."""
+    return resource_uri.strip("/").replace("/", ":") or "base"
+
+
+def _lease_coordinator(
+    settings: Dict[str, Any], ckpt_store: CheckpointStore, logger: logging.Logger
+) -> Optional[LeaseCoordinator]:
+    """Return a lease coordinator when ``coordination`` is on in [general], else None (this node runs every input)."""
+    if str(settings.get("coordination", "false")).strip().lower() not in ("1", "true", "yes"):
+        return None
+    return LeaseCoordinator(
+        ckpt_store,
+        logger,
+        node_id=str(settings.get("coordination_node_id") or "").strip() or None,
+        ttl_sec=to_positive_int(settings.get("lease_ttl_sec"), LEASE_TTL_SEC),
+    )
+
+
+def _input_shard(input_name: str, input_item: Dict[str, Any], shard_by: str) -> str:
+    """Lease shard of an input: the input itself, or ``org:<org>`` with ``coordination_shard_by = org``."""
+    if shard_by == "org" and input_item.get("apigee_org_name"):
+        return f"org:{input_item['apigee_org_name']}"
+    return input_name.split("/")[-1]
+
+
+def _claim_inputs(
+    coordinator: LeaseCoordinator,
+    items: Iterable[Tuple[str, Dict[str, Any]]],
+    settings: Dict[str, Any],
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Rebalance the leases over ``items`` and return the inputs this node runs."""
+    items = list(items)
+    shard_by = str(settings.get("coordination_shard_by") or "input").strip().lower()
+    shards: Dict[str, List[str]] = {}
+    for input_name, input_item in items:
+        shards.setdefault(_input_shard(input_name, input_item, shard_by), []).append(input_name.split("/")[-1])
+    held = coordinator.rebalance(shards)
+    return [(name, item) for name, item in items if _input_shard(name, item, shard_by) in held]
 
 
 # ------------------------- Validation -------------------------
@@ -97,6 +213,31 @@ def validate_input_config(input_item: Dict[str, Any], logger: logging.Logger) ->
         if ival < 60:
             logger.warning("Input '%s': very short interval (%s)s", name, ival)
 
+    fetch_mode = str(input_item.get("fetch_mode") or "single").strip().lower()
+    if fetch_mode not in ("single", "paged"):
+        raise ValueError(f"Input '{name}': fetch_mode must be 'single' or 'paged', got: {fetch_mode}")
+
+    for option, (low, high) in INPUT_INT_RANGES.items():
+        value = input_item.get(option)
+        if value in (None, ""):
+            continue
+        try:
+            option_val = int(value)
+        except Exception:
+            raise ValueError(f"Input '{name}': {option} must be an integer")
+        if option_val < low or option_val > high:
+            raise ValueError(f"Input '{name}': {option} must be between {low} and {high}")
+
+    try:
+        _parse_resource_uris(input_item.get("audit_resource_uri"))
+    except ValueError as e:
+        raise ValueError(f"Input '{name}': Audit EndPoint must be a path or a list of paths. Error: {e}")
+
+    try:
+        compile_record_filter(input_item.get("record_filter"))
+    except ValueError as e:
+        raise ValueError(f"Input '{name}': Invalid record filter. Error: {e}")
+
     # URL must be https
     apigee_url = (input_item.get("apigee_url") or "").strip()
     if not apigee_url.startswith("https://"):
@@ -146,6 +287,26 @@ def validate_input(definition: smi.ValidationDefinition):
 
 
 # ------------------------- API call -------------------------
+
+DEFAULT_PAGE_SIZE = 1000
+LARGE_RESPONSE_WARN_MB = 64  # single-mode responses are held whole; past this, suggest paged mode
+MAX_WINDOW_SHARDS = 16
+MAX_CONCURRENT_ENDPOINTS = 4
+# Integer input options and the ranges the inputs page (globalConfig "json") allows
+INPUT_INT_RANGES = {
+    "window_shards": (1, MAX_WINDOW_SHARDS),
+    "sort_buffer_mb": (1, 4096),
+    "pipeline_queue_depth": (1, 64),
+    "max_concurrent_endpoints": (1, 16),
+    "backfill_chunk_hours": (1, 168),
+    "backfill_concurrency": (1, 8),
+    "backfill_max_run_sec": (1, 3600),
+    "backfill_max_requests_per_sec": (1, 50),
+}
+MIN_SHARD_SPAN_MS = 60 * 1000
+_JSON_HEADERS = {"Accept": "application/json"}
+
+
 def build_apigee_audit_url(base_url: str, org: str, audit_path: str) -> str:
     """
     Constructs the full Apigee API URL.
@@ -198,7 +359,12 @@ def get_data_from_api(
     apigee_ssl_client_cert_pem: Optional[str] = None,
     apigee_ssl_key_pem: Optional[str] = None,
     apigee_ssl_client_cert_path: Optional[str] = None,
-    apigee_ssl_key_path: Optional[str] = None
+    apigee_ssl_key_path: Optional[str] = None,
+    response_observer: Optional[Callable[[int, float], None]] = None,
+    metrics: Optional[PhaseMetrics] = None,
+    passthrough_fields: Optional[List[str]] = None,
+    parallel_parser: Optional[ParallelParser] = None,
+    limiter: Optional[AdaptiveRateLimiter] = None,
 ) -> Any:
     logger.info("Calling Apigee API endpoint: %s", apigee_url_endpoint)
 
@@ -219,9 +385,10 @@ def get_data_from_api(
 
     logger.info("Calling Apigee API endpoint with params: %s", params)
 
-    headers = {"Accept": "application/json"}
+    headers = dict(_JSON_HEADERS)
 
     try:
+        started = time.monotonic()
         response = http_get_with_retry(
             logger=logger,
             url=apigee_url_endpoint,
@@ -231,19 +398,307 @@ def get_data_from_api(
             proxies=proxy_settings,
             cert=cert_tuple,
             verify_ssl=validate_ssl,
+            limiter=limiter,
+            metrics=metrics,
         )
         logger.info("response  code from the APIGEE API is : %s", response.status_code)
-        logger.debug("Actual response from the APIGEE API is : %s", response.json())
-        return response.json()
-       
+        if len(response.content) > LARGE_RESPONSE_WARN_MB << 20:
+            logger.warning(
+                "Audit response of %.0f MB is held in memory whole; set fetch_mode=paged to bound memory",
+                len(response.content) / 1048576.0,
+            )
+        metrics = metrics or PhaseMetrics()
+        with metrics.phase("json_decode"):
+            data = _decode_response(response, passthrough_fields, parallel_parser)
+        received = len(_audit_records(data))
+        metrics.count("records_received", received)
+        if response_observer is not None:
+            response_observer(received, time.monotonic() - started)
+        logger.debug("Actual response from the APIGEE API is : %s", data)
+        return data
+
+    finally:
+        cleanup_temp_files(logger, temps)
+
+
+def _decode_response(
+    response: Any,
+    passthrough_fields: Optional[List[str]] = None,
+    parallel_parser: Optional[ParallelParser] = None,
+) -> Any:
+    """Decode an audit response; with ``passthrough_fields`` records stay raw JSON text where possible."""
+    parallel = parallel_parser is not None and len(response.content) >= parallel_parser.min_bytes
+    if passthrough_fields or parallel:
+        try:
+            text = response.content.decode(response.encoding or "utf-8")
+        except (LookupError, UnicodeDecodeError):
+            text = None
+        records = None
+        if text is not None and parallel:
+            records = parallel_parser.parse(text)
+        if records is None and text is not None and passthrough_fields:
+            records = compile_record_scanner(passthrough_fields).scan(text)
+        if records is not None:
+            return {"auditRecord": records}
+    return response.json()
+
+
+def _audit_records(data: Any) -> List[Dict[str, Any]]:
+    """Flatten an audit API response (object or list of objects) into its auditRecord list."""
+    if isinstance(data, dict):
+        return data.get("auditRecord", []) or []
+    if isinstance(data, list):
+        return [r for item in data if isinstance(item, dict) for r in (item.get("auditRecord") or [])]
+    return []
+
+
+def _page_size_param(api_params: Dict[str, Any]) -> Tuple[str, int]:
+    """Return (param name, page size) taken from ``rows``/``limit`` in api_params."""
+    for key in ("rows", "limit"):
+        if key in api_params:
+            try:
+                return key, max(1, int(api_params[key]))
+            except (TypeError, ValueError):
+                break
+    return "rows", DEFAULT_PAGE_SIZE
+
+
+def _record_key(record: Any) -> str:
+    # Only timestamped records are keyed, and their "ts" is dropped on output;
+    # raw records are decoded so both representations give the same key.
+    if type(record) is RawRecord:
+        record = json.loads(record.text)
+    elif "ts" in record:
+        record = {k: v for k, v in record.items() if k != "ts"}
+    return json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def iter_audit_pages(
+    logger: logging.Logger,
+    account_name: str,
+    apigee_url_endpoint: str,
+    auth: Optional[HTTPBasicAuth],
+    api_start_time_ms: int,
+    api_end_time_ms: int,
+    proxy_settings: Optional[Dict[str, str]],
+    validate_ssl: bool,
+    api_params: Dict[str, Any],
+    timestamp_fields: List[str],
+    apigee_ssl_client_cert_pem: Optional[str] = None,
+    apigee_ssl_key_pem: Optional[str] = None,
+    apigee_ssl_client_cert_path: Optional[str] = None,
+    apigee_ssl_key_path: Optional[str] = None,
+    response_observer: Optional[Callable[[int, float], None]] = None,
+    metrics: Optional[PhaseMetrics] = None,
+    passthrough_fields: Optional[List[str]] = None,
+    parallel_parser: Optional[ParallelParser] = None,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Page through the audit window and yield ``{"auditRecord": [...]}`` batches, oldest first.
+
+    Each page starts at the newest timestamp seen so far; boundary records already yielded are dropped.
+    """
+    cert_tuple, temps = build_cert_files(
+        logger=logger,
+        account_name=account_name,
+        client_cert_pem=apigee_ssl_client_cert_pem,
+        client_key_pem=apigee_ssl_key_pem,
+        client_cert_path=apigee_ssl_client_cert_path,
+        client_key_path=apigee_ssl_key_path,
+    )
+
+    size_key, page_size = _page_size_param(api_params)
+    extract_ts = compile_timestamp_extractor(timestamp_fields, logger)
+    headers = dict(_JSON_HEADERS)
+    metrics = metrics or PhaseMetrics()
+    cursor = api_start_time_ms
+    boundary_keys: Set[str] = set()
+    page_no = 0
+
+    try:
+        while cursor <= api_end_time_ms:
+            page_no += 1
+            params = {
+                **api_params,
+                "startTime": str(cursor),
+                "endTime": str(api_end_time_ms),
+                size_key: str(page_size),
+                "sortOrder": "asc",
+            }
+            logger.debug("Fetching audit page %s with params: %s", page_no, params)
+            started = time.monotonic()
+            response = http_get_with_retry(
+                logger=logger,
+                url=apigee_url_endpoint,
+                params=params,
+                headers=headers,
+                auth=auth,
+                proxies=proxy_settings,
+                cert=cert_tuple,
+                verify_ssl=validate_ssl,
+                limiter=limiter,
+                metrics=metrics,
+            )
+            with metrics.phase("json_decode"):
+                records = _audit_records(_decode_response(response, passthrough_fields, parallel_parser))
+            del response
+            metrics.count("records_received", len(records))
+            if response_observer is not None:
+                response_observer(len(records), time.monotonic() - started)
+
+            fresh: List[Dict[str, Any]] = []
+            page_max: Optional[int] = None
+            at_max: List[Dict[str, Any]] = []
+            for record in records:
+                ts = extract_ts(record)
+                if ts == cursor and boundary_keys and _record_key(record) in boundary_keys:
+                    continue
+                fresh.append(record)
+                if ts is None:
+                    continue
+                if page_max is None or ts > page_max:
+                    page_max = ts
+                    at_max = [record]
+                elif ts == page_max:
+                    at_max.append(record)
+
+            logger.info(
+                "Audit page %s: %d records received, %d new, cursor=%s",
+                page_no, len(records), len(fresh), cursor,
+            )
+            if fresh:
+                yield {"auditRecord": fresh}
+
+            if len(records) < page_size:
+                break
+
+            if page_max is None or page_max < cursor or (page_max == cursor and not fresh):
+                # A full page that cannot move the cursor (no timestamps, or every
+                # record shares the boundary millisecond). Step past it rather
+                # than request the same page forever.
+                logger.warning(
+                    "Audit page %s did not advance past %s; skipping to the next millisecond. "
+                    "Increase '%s' if records are being lost.",
+                    page_no, cursor, size_key,
+                )
+                cursor += 1
+                boundary_keys = set()
+                continue
+
+            new_keys = {_record_key(r) for r in at_max}
+            boundary_keys = boundary_keys | new_keys if page_max == cursor else new_keys
+            cursor = page_max
     finally:
         cleanup_temp_files(logger, temps)
 
 
+def split_time_window(start_ms: int, end_ms: int, shards: int) -> List[Tuple[int, int]]:
+    """Split ``[start_ms, end_ms]`` into at most ``shards`` contiguous inclusive sub-windows, oldest first."""
+    span = end_ms - start_ms + 1
+    if span <= 0:
+        return [(start_ms, end_ms)]
+    count = max(1, min(shards, MAX_WINDOW_SHARDS, span // MIN_SHARD_SPAN_MS or 1))
+    step = -(-span // count)  # ceil
+    windows = []
+    lo = start_ms
+    while lo <= end_ms:
+        hi = min(lo + step - 1, end_ms)
+        windows.append((lo, hi))
+        lo = hi + 1
+    return windows
+
+
+def iter_sharded_audit_pages(
+    logger: logging.Logger,
+    shards: int,
+    timestamp_fields: List[str],
+    api_start_time_ms: int,
+    api_end_time_ms: int,
+    api_params: Dict[str, Any],
+    **fetch_kwargs: Any,
+) -> Iterator[Dict[str, Any]]:
+    """Page the window as concurrent sub-windows and yield k-way merged, time-ordered batches.
+
+    Every shard pages, whatever ``fetch_mode`` is, so a capped shard cannot let the checkpoint skip records.
+    """
+    windows = split_time_window(api_start_time_ms, api_end_time_ms, shards)
+    logger.info("Fetching %d sub-windows concurrently: %s", len(windows), windows)
+    _, batch_size = _page_size_param(api_params)
+    extract_ts = compile_timestamp_extractor(timestamp_fields, logger)
+
+    untimed: List[Dict[str, Any]] = []
+    untimed_lock = threading.Lock()
+
+    def _pages(lo: int, hi: int) -> Iterator[Dict[str, Any]]:
+        return iter_audit_pages(
+            timestamp_fields=timestamp_fields,
+            api_start_time_ms=lo,
+            api_end_time_ms=hi,
+            api_params=api_params,
+            logger=logger,
+            **fetch_kwargs,
+        )
+
+    def _sorted_chunks(lo: int, hi: int) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+        for page in _pages(lo, hi):
+            timed: List[Tuple[int, Dict[str, Any]]] = []
+            for record in page.get("auditRecord", []):
+                ts = extract_ts(record)
+                if ts:
+                    timed.append((ts, record))
+                else:
+                    with untimed_lock:
+                        untimed.append(record)
+            timed.sort(key=lambda x: x[0])
+            yield timed
+
+    streams = [
+        itertools.chain.from_iterable(
+            iter_in_background(_sorted_chunks(lo, hi), max_pending=2, name=f"apigee_shard_{i}")
+        )
+        for i, (lo, hi) in enumerate(windows)
+    ]
+    batch: List[Dict[str, Any]] = []
+    for _, record in heapq.merge(*streams, key=lambda x: x[0]):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield {"auditRecord": batch}
+            batch = []
+    if batch:
+        yield {"auditRecord": batch}
+    if untimed:
+        yield {"auditRecord": untimed}
+
+
+def _open_event_source(
+    fetch_mode: str,
+    window_shards: int,
+    timestamp_fields: List[str],
+    fetch_kwargs: Dict[str, Any],
+) -> Iterable[Dict[str, Any]]:
+    """Return the ``{"auditRecord": [...]}`` batches for one window; single mode makes one whole-body request."""
+    if window_shards > 1:
+        return iter_sharded_audit_pages(shards=window_shards, timestamp_fields=timestamp_fields, **fetch_kwargs)
+    if fetch_mode == "paged":
+        return iter_audit_pages(timestamp_fields=timestamp_fields, **fetch_kwargs)
+    data = get_data_from_api(**fetch_kwargs)
+    return data if isinstance(data, list) else [data]
+
+
+def _is_timeout(ex: Exception) -> bool:
+    if isinstance(ex, requests.exceptions.Timeout):
+        return True
+    return getattr(getattr(ex, "response", None), "status_code", None) in (408, 504)
+
+
 # ------------------------- Event processing -------------------------
 
+PIPELINE_QUEUE_DEPTH = 4  # pages buffered between the fetch, parse and write stages
+METRICS_SOURCETYPE = "apigee:audit:metrics"
+
+
 def process_events_with_checkpoint(
-    events: List[Dict[str, Any]],
+    events: Iterable[Dict[str, Any]],
     event_writer: smi.EventWriter,
     input_item: Dict[str, Any],
     sourcetype: str,
@@ -252,182 +707,709 @@ def process_events_with_checkpoint(
     ckpt_mgr,
     input_key: str,
     logger: logging.Logger,
+    ordered_batches: bool = False,
+    json_encoder: str = "json",
+    sort_buffer_mb: int = SORT_BUFFER_MB,
+    dedupe: Optional[DedupeIndex] = None,
+    pipeline_depth: int = 0,
+    checkpoint_extra: Optional[Dict[str, Any]] = None,
+    metrics: Optional[PhaseMetrics] = None,
+    record_filter: Optional[RecordFilter] = None,
+    hec_sink: Optional[HecSink] = None,
 ) -> int:
-    processed = 0
-    latest_ts: Optional[int] = None
-
-    record_with_ts: List[Tuple[Dict[str, Any], int]] = []
-    record_without_ts: List[Dict[str, Any]] = []
-
-    for ev in events:
-        audit_records = ev.get("auditRecord", [])
-        for record in audit_records:
-            ts = extract_timestamp_from_event(record, timestamp_fields, logger)
-            if ts:
-                record_with_ts.append((record, ts))
-            else:
-                record_without_ts.append(record)
-
-    record_with_ts.sort(key=lambda x: x[1])
-    logger.info("Sorted %d records by timestamp for processing", len(record_with_ts))
+    """Write audit records sorted by timestamp and advance the input checkpoint.
 
-    for ev, ts in record_with_ts:
+    With ``ordered_batches`` each element is a page later than the previous one and is written and
+    checkpointed on its own; otherwise all records are sorted as one set through an ``ExternalSorter``.
+    A single-mode response is still decoded whole before it gets here; only ``fetch_mode=paged`` keeps
+    memory flat end to end. The checkpoint only moves once a batch has been written (or accepted by HEC).
+    """
+    extract_ts = compile_timestamp_extractor(timestamp_fields, logger)
+    encode = make_json_encoder(json_encoder)
+    metrics = metrics or PhaseMetrics()
+    skipped_before = dedupe.skipped if dedupe is not None else 0
+    filtered = 0
+    filtered_ts: Optional[int] = None
+
+    def _filter(records: List[Any], stamps: List[Optional[int]]) -> Tuple[List[Any], List[Optional[int]]]:
+        nonlocal filtered, filtered_ts
+        kept: List[Any] = []
+        kept_stamps: List[Optional[int]] = []
+        apply = record_filter.apply
+        for record, ts in zip(records, stamps):
+            record = apply(record)
+            if record is None:
+                filtered += 1
+                if ts and (filtered_ts is None or ts > filtered_ts):
+                    filtered_ts = ts
+                continue
+            kept.append(record)
+            kept_stamps.append(ts)
+        return kept, kept_stamps
+
+    def _serialize(records: List[Any], timed_out: Any, untimed_out: Any, consume: bool = False) -> None:
+        # Two passes over the batch, so each phase is timed once per batch
+        # rather than per record. ``consume`` drops each parsed record as soon
+        # as it is serialized.
+        with metrics.phase("timestamp_extract"):
+            stamps = [extract_ts(record) for record in records]
+        if record_filter is not None:
+            with metrics.phase("filter"):
+                records, stamps = _filter(records, stamps)
+        with metrics.phase("serialize"):
+            for i, ts in enumerate(stamps):
+                record = records[i]
+                if consume:
+                    records[i] = None
+                try:
+                    if type(record) is RawRecord:
+                        payload = record.text  # final text: no top-level "ts" to drop
+                    else:
+                        if ts and "ts" in record:
+                            record = {k: v for k, v in record.items() if k != "ts"}
+                        payload = encode(record)
+                    if ts:
+                        timed_out(ts, payload)
+                    else:
+                        untimed_out(payload)
+                except Exception as ex:
+                    logger.error("Failed to write event: %s", ex)
+
+    def _ordered_pages(batches: Iterable[Dict[str, Any]]) -> Iterator[List[Tuple[Optional[int], str]]]:
+        for batch in batches:
+            timed: List[Tuple[Optional[int], str]] = []
+            untimed: List[str] = []
+            _serialize(batch.get("auditRecord") or [], lambda ts, p: timed.append((ts, p)), untimed.append)
+            with metrics.phase("sort"):
+                timed.sort(key=lambda x: x[0])
+            logger.info("Sorted %d records by timestamp for processing", len(timed))
+            timed.extend((None, payload) for payload in untimed)
+            yield timed
+
+    def _ordered_stream() -> Iterator[Tuple[Optional[int], str]]:
+        if pipeline_depth > 0:
+            fetched = iter_in_background(events, max_pending=pipeline_depth, name="apigee_fetch")
+            pages = iter_in_background(_ordered_pages(fetched), max_pending=pipeline_depth, name="apigee_parse")
+        else:
+            pages = _ordered_pages(events)
         try:
-            ev_clean = dict(ev)  # shallow copy
-            ev_clean.pop("ts", None)  # remove 'ts' if present
-
-            event_writer.write_event(
-                smi.Event(
-                    data=json.dumps(ev_clean, ensure_ascii=False, default=str),
-                    index=input_item.get("index"),
-                    sourcetype=sourcetype,
-                    time=ts // 1000,
-                    source=source,
-                )
+            for page in pages:
+                yield from page
+        finally:
+            pages.close()
+
+    def _external_stream() -> Iterator[Tuple[Optional[int], str]]:
+        max_bytes = max(1, sort_buffer_mb) * 1024 * 1024
+        timed = ExternalSorter(max_bytes=max_bytes)
+        untimed = ExternalSorter(max_bytes=max_bytes)  # constant key: keeps arrival order
+        try:
+            for batch in events:
+                # Take ownership of the record list so parsed records are
+                # released as they are serialized.
+                _serialize(batch.pop("auditRecord", None) or [], timed.add, lambda p: untimed.add(0, p), consume=True)
+            logger.info(
+                "Sorted %d records by timestamp for processing (%d spilled runs)",
+                len(timed), timed.spilled_runs + untimed.spilled_runs,
             )
-            processed += 1
-            latest_ts = ts
-            if processed % 100 == 0:
-                update_checkpoint(ckpt_mgr, input_key, latest_ts, processed, logger)
-        except Exception as ex:
-            logger.error("Failed to write event: %s", ex)
+            yield from timed
+            for _, payload in untimed:
+                yield None, payload
+        finally:
+            metrics.add_time("sort", timed.sort_seconds + untimed.sort_seconds)
+            timed.close()
+            untimed.close()
 
-    fallback_now = now_ms()
-    for ev in record_without_ts:
+    processed = 0
+    latest_ts: Optional[int] = None  # checkpointed
+    marked_ts: Optional[int] = None  # checkpoint of the last batch handed to the writer
+    queued_ts: Optional[int] = None
+    if hec_sink is not None:
+        writer = HecEventWriter(hec_sink, input_item.get("index"), sourcetype, source, metrics=metrics)
+    else:
+        writer = BatchEventWriter(event_writer, input_item.get("index"), sourcetype, source)
+
+    def _checkpoint_extra() -> Dict[str, Any]:
+        extra = dict(checkpoint_extra or {})
+        if dedupe is not None:
+            extra["dedupe"] = dedupe.to_state()
+        return extra
+
+    def _commit(count: int, ts: int, extra: Dict[str, Any]) -> None:
+        nonlocal processed, latest_ts
+        processed += count
+        latest_ts = ts
+        with metrics.phase("checkpoint"):
+            update_checkpoint(ckpt_mgr, input_key, ts, processed, logger, extra=extra)
+
+    def _flush() -> None:
+        nonlocal marked_ts
+        if not len(writer):
+            return
+        if queued_ts is not None:
+            marked_ts = queued_ts
+        elif marked_ts is None:
+            marked_ts = now_ms()  # only untimestamped records so far
+        mark, extra = marked_ts, _checkpoint_extra()
         try:
-            event_writer.write_event(
-                smi.Event(
-                    data=json.dumps(ev, ensure_ascii=False, default=str),
-                    index=input_item.get("index"),
-                    sourcetype=sourcetype,
-                )
-            )
-            processed += 1
-            if latest_ts is None:
-                latest_ts = fallback_now
+            with metrics.phase("event_write"):
+                writer.flush(lambda count: _commit(count, mark, extra))
+        except HecError:
+            raise
         except Exception as ex:
-            logger.error("Failed to write event: %s", ex)
-
-    if latest_ts:
-        update_checkpoint(ckpt_mgr, input_key, latest_ts, processed, logger)
+            # Stop here: later batches must not move the checkpoint past this one.
+            logger.error("Failed to write event batch: %s", ex)
+            raise
 
+    stream = _ordered_stream() if ordered_batches else _external_stream()
+    try:
+        for ts, payload in stream:
+            if dedupe is not None and dedupe.seen(ts, payload):
+                continue
+            writer.add(payload, None if ts is None else ts // 1000)
+            if ts is not None:
+                queued_ts = ts
+            if writer.full:
+                _flush()
+        _flush()
+    finally:
+        stream.close()
+        writer.close()  # HEC: waits for the batches in flight and commits them
+    if filtered_ts is not None and (latest_ts is None or filtered_ts > latest_ts):
+        _commit(0, filtered_ts, _checkpoint_extra())
+
+    metrics.count("events_written", processed)
+    metrics.count("chars_written", writer.chars_written)
+    if filtered:
+        metrics.count("records_filtered", filtered)
+        logger.info("Filtered out %d records", filtered)
+    skipped = dedupe.skipped - skipped_before if dedupe is not None else 0
+    if skipped:
+        metrics.count("duplicates_skipped", skipped)
+        logger.info("Skipped %d records already ingested by a previous run", skipped)
     return processed
 
 
 # ------------------------- stream_events -------------------------
 
+INPUTS_CONF = "inputs"
+INPUT_KIND = "apigee_audit_input"
+DEFAULT_INTERVAL_SEC = 300
+# Daemon mode: how often input stanzas are re-read, and how long SIGTERM waits
+# for running inputs before checkpoints are flushed and the process exits.
+DAEMON_RELOAD_SEC = 60.0
+DAEMON_STOP_GRACE_SEC = 20.0
+# Backfill: history older than the live tail is fetched in chunks of this
+# size, a few at a time, at a capped request rate of its own.
+BACKFILL_CHUNK_HOURS = 6
+BACKFILL_CONCURRENCY = 2
+BACKFILL_MAX_REQUESTS_PER_SEC = 2
+BACKFILL_RUN_SHARE = 0.8  # of the input interval; chunks stop at the next page after that
+
+
+class _BackfillPaused(Exception):
+    """A backfill chunk stopped between pages because the run's backfill budget was spent."""
+
+
+def _pages_until(pages: Iterable[Dict[str, Any]], deadline: float) -> Iterator[Dict[str, Any]]:
+    """Yield ``pages``; once ``deadline`` (monotonic) has passed, raise ``_BackfillPaused`` instead of fetching more."""
+    pages = iter(pages)
+    try:
+        for page in pages:
+            yield page
+            if time.monotonic() >= deadline:
+                raise _BackfillPaused()
+    finally:
+        close = getattr(pages, "close", None)
+        if close is not None:
+            close()
+
+
 def stream_events(inputs: smi.InputDefinition, event_writer: smi.EventWriter):
-    for input_name, input_item in inputs.inputs.items():
-        norm_name = input_name.split("/")[-1]
-        logger = logger_for_input(norm_name)
-        ckpt_mgr = None
+    """Ingest every configured input, sharing one write-behind checkpoint store.
 
-        try:
-            session_key = inputs.metadata["session_key"]
+    Inputs run on up to ``max_concurrent_inputs`` workers; ``daemon_mode`` keeps the process alive
+    (see ``_run_daemon``) and ``coordination`` splits inputs between nodes (see ``LeaseCoordinator``).
+    """
+    session_key = inputs.metadata["session_key"]
+    items = list(inputs.inputs.items())
+    logger = logger_for_input("stream_events")
+
+    settings = _load_settings_conf(session_key, logger)
+    if str(settings.get("daemon_mode", "false")).strip().lower() in ("1", "true", "yes"):
+        _run_daemon(session_key, items, event_writer, settings, logger)
+        return
+
+    _exit_on_sigterm(logger)
+    ckpt_store = get_checkpoint_store(session_key, logger)
+    coordinator = _lease_coordinator(settings, ckpt_store, logger)
+    try:
+        if coordinator is not None:
+            items = _claim_inputs(coordinator, items, settings)
+            coordinator.start()
+        max_workers = min(to_positive_int(settings.get("max_concurrent_inputs"), 1), len(items) or 1)
+        if max_workers <= 1:
+            for input_name, input_item in items:
+                _ingest_input(input_name, input_item, session_key, event_writer, ckpt_store)
+            return
+
+        writer = SerializedEventWriter(event_writer)
+        account_slots = ConcurrencyLimiter()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="apigee_input") as pool:
+            futures = [
+                pool.submit(
+                    _ingest_input, input_name, input_item, session_key, writer, ckpt_store, account_slots
+                )
+                for input_name, input_item in items
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        if coordinator is not None:
+            coordinator.close()  # leases stay held for this node's next run
+        ckpt_store.close()
 
-            # log level
-            log_level = conf_manager.get_log_level(
-                logger=logger,
-                session_key=session_key,
-                app_name=ADDON_NAME,
-                conf_name="splunk_ta_apigee_settings",
+
+def _exit_on_sigterm(logger: logging.Logger, stop: Optional[threading.Event] = None) -> None:
+    """Turn SIGTERM from splunkd into SystemExit (or set ``stop``) so ``finally`` blocks still flush checkpoints."""
+    def _handler(signum, frame):
+        logger.info("Received signal %s; flushing checkpoints and exiting", signum)
+        if stop is not None:
+            stop.set()
+            return
+        raise SystemExit(0)
+
+    try:
+        signal.signal(signal.SIGTERM, _handler)
+    except ValueError:
+        # Not on the main thread (e.g. embedded in a test harness); nothing to install.
+        pass
+
+
+def _run_daemon(
+    session_key: str,
+    items: List[Tuple[str, Dict[str, Any]]],
+    event_writer: smi.EventWriter,
+    settings: Dict[str, Any],
+    logger: logging.Logger,
+) -> None:
+    """Stay alive and run every input on its own ``interval``; inputs are re-read every DAEMON_RELOAD_SEC."""
+    stop = threading.Event()
+    _exit_on_sigterm(logger, stop)
+    kind = items[0][0].split("://")[0] if items else INPUT_KIND
+    definitions = dict(items)
+    # splunkd starts one process per stanza, so never pick up stanzas another process runs.
+    own_names = frozenset(definitions)
+    max_workers = to_positive_int(settings.get("max_concurrent_inputs"), 1)
+    ckpt_store = get_checkpoint_store(session_key, logger)
+    writer = SerializedEventWriter(event_writer)
+    account_slots = ConcurrencyLimiter()
+    scheduler = IntervalScheduler(max_workers, thread_name_prefix="apigee_input")
+    coordinator = _lease_coordinator(settings, ckpt_store, logger)
+
+    def _job(input_name: str, input_item: Dict[str, Any], shard: str) -> Callable[[], None]:
+        def _run() -> None:
+            if coordinator is None:
+                _ingest_input(input_name, input_item, session_key, writer, ckpt_store, account_slots)
+                ckpt_store.flush()
+                return
+            with coordinator.running(shard) as owned:
+                if not owned:
+                    return  # handed off or lost; the coordinator logs which
+                _ingest_input(input_name, input_item, session_key, writer, ckpt_store, account_slots)
+                ckpt_store.flush()
+        return _run
+
+    logger.info("Daemon mode: scheduling %d inputs with %d workers", len(definitions), max_workers)
+    try:
+        if coordinator is not None:
+            coordinator.start()
+        while not stop.is_set():
+            shard_by = str(settings.get("coordination_shard_by") or "input").strip().lower()
+            runnable = definitions
+            if coordinator is not None:
+                runnable = dict(_claim_inputs(coordinator, definitions.items(), settings))
+            scheduler.set_jobs({
+                name: (
+                    to_positive_int(item.get("interval"), DEFAULT_INTERVAL_SEC),
+                    _job(name, item, _input_shard(name, item, shard_by)),
+                )
+                for name, item in runnable.items()
+            })
+            scheduler.run_until(time.monotonic() + DAEMON_RELOAD_SEC, stop)
+            if stop.is_set():
+                break
+            settings = _load_settings_conf(session_key, logger)
+            if str(settings.get("daemon_mode", "false")).strip().lower() not in ("1", "true", "yes"):
+                logger.info("Daemon mode turned off; exiting after running inputs finish")
+                break
+            definitions = _reload_input_definitions(session_key, kind, own_names, definitions, logger)
+    finally:
+        if not scheduler.shutdown(DAEMON_STOP_GRACE_SEC):
+            logger.warning(
+                "Inputs still running after %.0fs; closing checkpoints anyway, their later updates are refused "
+                "and those windows are fetched again on the next run",
+                DAEMON_STOP_GRACE_SEC,
             )
-            logger.setLevel(log_level)
+        if coordinator is not None:
+            coordinator.close(release=True)
+        ckpt_store.close()
 
-            log.modular_input_start(logger, norm_name)
 
-            # checkpoint
-            ckpt_mgr = get_checkpoint_manager(session_key)
+def _reload_input_definitions(
+    session_key: str,
+    kind: str,
+    names: FrozenSet[str],
+    current: Dict[str, Dict[str, Any]],
+    logger: logging.Logger,
+) -> Dict[str, Dict[str, Any]]:
+    """Re-read the enabled ``<kind>://`` stanzas in ``names``; keeps ``current`` if splunkd can't be read."""
+    invalidate_conf_cache(INPUTS_CONF)
+    try:
+        stanzas = get_conf_stanzas(session_key, INPUTS_CONF)
+    except Exception as ex:
+        logger.warning("Could not reload input definitions; keeping the current ones: %s", ex)
+        return current
+    prefix = f"{kind}://"
+    loaded = {
+        name: body
+        for name, body in stanzas.items()
+        if name.startswith(prefix)
+        and name in names
+        and str(body.get("disabled", "false")).strip().lower() not in ("1", "true", "yes")
+    }
+    if set(loaded) != set(current):
+        logger.info(
+            "Input definitions changed: added=%s removed=%s",
+            sorted(set(loaded) - set(current)),
+            sorted(set(current) - set(loaded)),
+        )
+    return loaded
+
+
+def _ingest_input(
+    input_name: str,
+    input_item: Dict[str, Any],
+    session_key: str,
+    event_writer: smi.EventWriter,
+    ckpt_mgr: CheckpointStore,
+    account_slots: Optional[ConcurrencyLimiter] = None,
+) -> None:
+    """Run one input end to end, fetching its resources concurrently; errors are logged, never raised."""
+    norm_name = input_name.split("/")[-1]
+    logger = logger_for_input(norm_name)
+    held = ExitStack()
+    metrics = PhaseMetrics()
+    settings: Dict[str, Any] = {}
+    status = "error"
 
-            # account
-            account_name = input_item.get("account")
+    try:
+        # log level
+        with metrics.phase("conf"):
+            logger.setLevel(get_log_level(session_key, default="INFO"))
+
+        log.modular_input_start(logger, norm_name)
+
+        # account
+        account_name = input_item.get("account")
+        with metrics.phase("conf"):
             acct = get_account_details(logger, session_key, account_name)
-            apigee_username = acct.get("apigee_username")
-            apigee_password = acct.get("apigee_password")
-            apigee_ssl_client_cert_path = acct.get("apigee_ssl_client_cert_path")
-            apigee_ssl_key_path = acct.get("apigee_ssl_key_path")
-            apigee_ssl_client_cert_pem = acct.get("apigee_ssl_client_cert")
-            apigee_ssl_key_pem = acct.get("apigee_ssl_key")
-
-            # input config
-            apigee_url_base = input_item.get("apigee_url")
-            apigee_org_name = input_item.get("apigee_org_name")
-            audit_resource_uri = input_item.get("audit_resource_uri", "/")
-            start_from = input_item.get("start_from")
-            sourcetype = input_item.get("sourcetype") or "apigee:audit"
-
-            # validate
-            validate_input_config(input_item, logger)
-
-            # timestamp fields
-            timestamp_fields = _parse_timestamp_fields(
-                input_item.get("timestamp_fields", "timeStamp")
-            )
+        apigee_username = acct.get("apigee_username")
+        apigee_password = acct.get("apigee_password")
+        if account_slots is not None:
+            with metrics.phase("account_slot_wait"):
+                held.enter_context(account_slots.hold(account_name, acct.get("max_concurrent_inputs")))
+
+        # input config
+        start_from = input_item.get("start_from")
+        sourcetype = input_item.get("sourcetype") or "apigee:audit"
+
+        # validate
+        validate_input_config(input_item, logger)
+        resource_uris = _parse_resource_uris(input_item.get("audit_resource_uri", "/"))
+
+        # timestamp fields
+        timestamp_fields = _parse_timestamp_fields(
+            input_item.get("timestamp_fields", "timeStamp")
+        )
 
-            # api params
-            api_params_raw = input_item.get("api_params", '{"rows":"1000","expand":"true"}')
-            try:
-                api_params = json.loads(api_params_raw.replace("'", '"'))
-            except json.JSONDecodeError:
-                logger.warning("Invalid JSON in API Parameter: %s; using defaults", api_params_raw)
-                api_params = {"limit": "1000", "sortOrder": "asc"}
+        # api params
+        api_params_raw = input_item.get("api_params", '{"rows":"1000","expand":"true"}')
+        try:
+            api_params = json.loads(api_params_raw.replace("'", '"'))
+        except json.JSONDecodeError:
+            logger.warning("Invalid JSON in API Parameter: %s; using defaults", api_params_raw)
+            api_params = {"limit": "1000", "sortOrder": "asc"}
 
-            # settings
+        # settings
+        with metrics.phase("conf"):
             settings = _load_settings_conf(session_key, logger)
-            validate_ssl = str(settings.get("validate_ssl", "true")).lower() != "false"
+        validate_ssl = str(settings.get("validate_ssl", "true")).lower() != "false"
 
-            # auth + proxy
-            auth = (
-                HTTPBasicAuth(str(apigee_username), str(apigee_password))
-                if apigee_username and apigee_password
-                else None
-            )
+        # auth + proxy
+        auth = (
+            requests.auth.HTTPBasicAuth(str(apigee_username), str(apigee_password))
+            if apigee_username and apigee_password
+            else None
+        )
+        with metrics.phase("conf"):
             proxies = get_proxy_settings(logger, session_key)
 
-            # time window
-            default_start = (
-                to_epoch_ms_from_datestr(start_from) if start_from else default_start_ms(7)
+        default_start = (
+            to_epoch_ms_from_datestr(start_from) if start_from else default_start_ms(7)
+        )
+        connection = dict(
+            logger=logger,
+            account_name=account_name,
+            auth=auth,
+            proxy_settings=proxies,
+            validate_ssl=validate_ssl,
+            apigee_ssl_client_cert_pem=acct.get("apigee_ssl_client_cert"),
+            apigee_ssl_key_pem=acct.get("apigee_ssl_key"),
+            apigee_ssl_client_cert_path=acct.get("apigee_ssl_client_cert_path"),
+            apigee_ssl_key_path=acct.get("apigee_ssl_key_path"),
+            metrics=metrics,
+        )
+        endpoint_kwargs = dict(
+            input_item=input_item,
+            ckpt_mgr=ckpt_mgr,
+            settings=settings,
+            sourcetype=sourcetype,
+            timestamp_fields=timestamp_fields,
+            api_params=api_params,
+            default_start=default_start,
+            connection=connection,
+        )
+
+        metrics.count("endpoints", len(resource_uris))
+        if len(resource_uris) == 1:
+            count = _ingest_resource(
+                resource_uri=resource_uris[0], ckpt_key=norm_name, event_writer=event_writer, **endpoint_kwargs
             )
-            ck_start = get_last_checkpoint_time(ckpt_mgr, norm_name, default_start, logger)
-            api_start_time = max(ck_start, default_start)
-            api_end_time = now_ms()
-            logger.info(
-                "Fetching data from %s to %s",
-                datetime.fromtimestamp(api_start_time / 1000),
-                datetime.fromtimestamp(api_end_time / 1000),
+            status = "ok"
+        else:
+            _migrate_single_resource_checkpoint(ckpt_mgr, norm_name, resource_uris, logger)
+            writer = (
+                event_writer if isinstance(event_writer, SerializedEventWriter)
+                else SerializedEventWriter(event_writer)
+            )
+            workers = min(
+                len(resource_uris),
+                to_positive_int(input_item.get("max_concurrent_endpoints"), MAX_CONCURRENT_ENDPOINTS),
             )
+            logger.info("Fetching %d audit resources with %d workers: %s", len(resource_uris), workers, resource_uris)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"apigee_{norm_name}") as pool:
+                futures = [
+                    (uri, pool.submit(
+                        _ingest_resource,
+                        resource_uri=uri,
+                        ckpt_key=f"{norm_name}:{_endpoint_key(uri)}",
+                        event_writer=writer,
+                        **endpoint_kwargs,
+                    ))
+                    for uri in resource_uris
+                ]
+            count = 0
+            failed = 0
+            for uri, future in futures:
+                try:
+                    count += future.result()
+                except Exception as e:
+                    failed += 1
+                    _log_ingest_error(logger, e, f"input={norm_name} resource={uri}")
+            status = "ok" if not failed else ("partial" if failed < len(futures) else "error")
+
+        log.events_ingested(
+                logger,
+                input_name,
+                sourcetype,
+                count,
+                input_item.get("index"),
+                account=input_item.get("account"),
+        )
+        log.modular_input_end(logger, norm_name)
+
+    except Exception as e:
+        _log_ingest_error(logger, e, f"input={norm_name}")
+    finally:
+        held.close()
+        _emit_input_metrics(
+            logger,
+            event_writer,
+            norm_name,
+            input_item,
+            metrics,
+            status,
+            index=input_item.get("metrics_index") or settings.get("metrics_index"),
+        )
 
-            # endpoint
-            full_url = build_apigee_audit_url(apigee_url_base, apigee_org_name, audit_resource_uri)
-            logger.info("Complete Apigee URL that will be queried without param is: %s", full_url)
-            source_name = build_source_name(apigee_org_name,audit_resource_uri)
 
-            
+def _migrate_single_resource_checkpoint(
+    ckpt_mgr: CheckpointStore, input_key: str, resource_uris: List[str], logger: logging.Logger
+) -> None:
+    """Carry the plain ``<input>`` checkpoint and backfill keys over to ``<input>:<resource>`` when a resource is added.
 
-            logger.info("Using Fields OrgName :%s and ResourceURI :%s for building the source name", apigee_org_name,audit_resource_uri)
+    They move to the resource they name, else the first listed one; keys the resource already has are left alone.
+    """
+    legacy = get_checkpoint_state(ckpt_mgr, input_key, logger)
+    plan = get_checkpoint_state(ckpt_mgr, f"{input_key}:backfill", logger)
+    if not legacy.get("last_event_time") and not plan.get("end"):
+        return
+    resource_uri = legacy.get("resource_uri") or plan.get("resource_uri") or resource_uris[0]
+    if resource_uri not in resource_uris:
+        return
+    key = f"{input_key}:{_endpoint_key(resource_uri)}"
+    states = {key: legacy if legacy.get("last_event_time") else {}}
+    if plan.get("end"):
+        # An unfinished backfill moves with the tail: its plan fixes where the tail began.
+        states[f"{key}:backfill"] = plan
+        for i in range(int(plan["chunks"])):
+            states[f"{key}:backfill:{i}"] = get_checkpoint_state(ckpt_mgr, f"{input_key}:backfill:{i}", logger)
+    moved = [
+        new_key for new_key, state in states.items()
+        if state and not get_checkpoint_state(ckpt_mgr, new_key, logger)
+    ]
+    for new_key in moved:
+        ckpt_mgr.update(new_key, {**states[new_key], "resource_uri": resource_uri})
+    if moved:
+        logger.info("Resource %s continues from %d checkpoint(s) of %s", resource_uri, len(moved), input_key)
+
+
+def _log_ingest_error(logger: logging.Logger, e: Exception, what: str) -> None:
+    if getattr(getattr(e, "response", None), "status_code", None) in (401, 403):
+        # Credentials were probably rotated; re-read the account on the next run.
+        invalidate_conf_cache(ACCOUNT_CONF)
+    log.log_exception(
+        logger,
+        e,
+        "apigee_ingest_error",
+        msg_before=f"Exception while ingesting data for {what}: ",
+    )
 
-            logger.info("Source name which will be used for writing data is : %s", source_name)
-            # call
-            data = get_data_from_api(
-                logger=logger,
-                account_name=account_name,
-                apigee_url_endpoint=full_url,
-                auth=auth,
-                api_start_time_ms=api_start_time,
-                api_end_time_ms=api_end_time,
-                proxy_settings=proxies,
-                validate_ssl=validate_ssl,
-                api_params=api_params,
-                apigee_ssl_client_cert_pem=apigee_ssl_client_cert_pem,
-                apigee_ssl_key_pem=apigee_ssl_key_pem,
-                apigee_ssl_client_cert_path=apigee_ssl_client_cert_path,
-                apigee_ssl_key_path=apigee_ssl_key_path,
-            )
 
+def _ingest_endpoint(
+    input_item: Dict[str, Any],
+    event_writer: smi.EventWriter,
+    ckpt_mgr: CheckpointStore,
+    ckpt_key: str,
+    settings: Dict[str, Any],
+    resource_uri: str,
+    sourcetype: str,
+    timestamp_fields: List[str],
+    api_params: Dict[str, Any],
+    default_start: int,
+    connection: Dict[str, Any],
+    end_time: Optional[int] = None,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+    deadline: Optional[float] = None,
+) -> int:
+    """Fetch one audit resource from its checkpoint up to ``end_time`` (default now); returns events written.
+
+    With a ``deadline`` (monotonic) paging stops once it passes and ``_BackfillPaused`` is raised.
+    """
+    logger = connection["logger"]
+    metrics = connection["metrics"]
+    apigee_org_name = input_item.get("apigee_org_name")
+
+    # time window
+    ck_start = get_last_checkpoint_time(ckpt_mgr, ckpt_key, default_start, logger)
+    dedupe = None
+    if str(input_item.get("dedupe", "true")).strip().lower() not in ("0", "false", "no"):
+        dedupe = DedupeIndex(get_checkpoint_state(ckpt_mgr, ckpt_key, logger).get("dedupe"))
+    api_start_time = max(ck_start, default_start)
+    api_end_time = now_ms() if end_time is None else end_time
+    logger.info(
+        "Fetching data from %s to %s",
+        datetime.fromtimestamp(api_start_time / 1000),
+        datetime.fromtimestamp(api_end_time / 1000),
+    )
 
-            
-            events = data if isinstance(data, list) else [data]
-            count = process_events_with_checkpoint(
+    # endpoint
+    full_url = build_apigee_audit_url(input_item.get("apigee_url"), apigee_org_name, resource_uri)
+    logger.info("Complete Apigee URL that will be queried without param is: %s", full_url)
+    # Inputs on the same host/org share one rate limiter; settings may cap it.
+    get_rate_limiter(full_url, max_rate=to_positive_int(settings.get("max_requests_per_sec"), 0) or None)
+    source_name = build_source_name(apigee_org_name, resource_uri)
+
+    logger.info("Using Fields OrgName :%s and ResourceURI :%s for building the source name", apigee_org_name, resource_uri)
+
+    logger.info("Source name which will be used for writing data is : %s", source_name)
+    # call
+    fetch_mode = str(input_item.get("fetch_mode") or "single").strip().lower()
+    fetch_kwargs = dict(
+        connection,
+        apigee_url_endpoint=full_url,
+        api_start_time_ms=api_start_time,
+        api_end_time_ms=api_end_time,
+        api_params=api_params,
+    )
+    if limiter is not None:
+        fetch_kwargs["limiter"] = limiter
+    passthrough = str(input_item.get("passthrough", "false")).strip().lower() in ("1", "true", "yes")
+    if passthrough:
+        fetch_kwargs["passthrough_fields"] = timestamp_fields
+    parse_workers = to_positive_int(settings.get("parse_workers"), 1)
+    if parse_workers > 1:
+        # Large responses are decoded on a process pool shared by all inputs.
+        fetch_kwargs["parallel_parser"] = ParallelParser(
+            parse_workers,
+            timestamp_fields,
+            logger,
+            json_encoder=settings.get("json_encoder") or "json",
+            passthrough=passthrough,
+            min_bytes=to_positive_int(settings.get("parse_parallel_min_mb"), PARSE_PARALLEL_MIN_BYTES >> 20) << 20,
+        )
+    window_shards = to_positive_int(input_item.get("window_shards"), 1)
+    pipeline_depth = 0
+    if str(input_item.get("pipeline", "true")).strip().lower() not in ("0", "false", "no"):
+        pipeline_depth = to_positive_int(input_item.get("pipeline_queue_depth"), PIPELINE_QUEUE_DEPTH)
+    tuner: Optional[WindowTuner] = None
+    paged = fetch_mode == "paged" or window_shards > 1
+    rows = _page_size_param(api_params)[1]
+    truncated = False
+    if str(input_item.get("auto_tune", "false")).strip().lower() in ("1", "true", "yes"):
+        tuner = WindowTuner(
+            get_checkpoint_state(ckpt_mgr, ckpt_key, logger).get("tuning"),
+            page_size=rows,
+            paged=paged,
+            max_page_size=None if paged else rows,  # single requests cannot ask for more than 'rows'
+        )
+
+        def _observe(records: int, elapsed_sec: float) -> None:
+            nonlocal truncated
+            if not paged and records >= rows:
+                truncated = True
+            tuner.observe_response(records, elapsed_sec)
+
+        fetch_kwargs["response_observer"] = _observe
+
+    def _save_window_checkpoint(last_event_time: Optional[int], total: int) -> None:
+        if last_event_time is None:
+            return
+        extra = {"resource_uri": resource_uri, "tuning": tuner.to_state()}
+        if dedupe is not None:
+            extra["dedupe"] = dedupe.to_state()
+        update_checkpoint(ckpt_mgr, ckpt_key, last_event_time, total, logger, extra=extra)
+
+    # Without auto-tuning the whole window is fetched at once; with it the
+    # window is walked in tuned sub-windows, each checkpointed when done.
+    count = 0
+    win_start = api_start_time
+    while True:
+        win_end = api_end_time if tuner is None else tuner.window_end(win_start, api_end_time)
+        window_kwargs = dict(fetch_kwargs, api_start_time_ms=win_start, api_end_time_ms=win_end)
+        if tuner is not None:
+            if paged:
+                size_key, _ = _page_size_param(api_params)
+                window_kwargs["api_params"] = {**api_params, size_key: str(tuner.page_size)}
+            logger.info(
+                "Auto-tune: fetching window %s..%s (%.0fs), page size %s",
+                win_start, win_end, (win_end - win_start + 1) / 1000.0, tuner.page_size,
+            )
+        events = _open_event_source(fetch_mode, window_shards, timestamp_fields, window_kwargs)
+        if deadline is not None and not isinstance(events, list):
+            events = _pages_until(events, deadline)
+        try:
+            window_count = process_events_with_checkpoint(
                     events=events,
                     event_writer=event_writer,
                     input_item=input_item,
@@ -435,24 +1417,277 @@ def stream_events(inputs: smi.InputDefinition, event_writer: smi.EventWriter):
                     source=source_name,
                     timestamp_fields=timestamp_fields,
                     ckpt_mgr=ckpt_mgr,
-                    input_key=norm_name,
+                    input_key=ckpt_key,
                     logger=logger,
+                    ordered_batches=fetch_mode == "paged" or window_shards > 1,
+                    json_encoder=settings.get("json_encoder") or "json",
+                    sort_buffer_mb=to_positive_int(input_item.get("sort_buffer_mb"), SORT_BUFFER_MB),
+                    dedupe=dedupe,
+                    pipeline_depth=pipeline_depth,
+                    checkpoint_extra={
+                        "resource_uri": resource_uri,
+                        **({"tuning": tuner.to_state()} if tuner is not None else {}),
+                    },
+                    metrics=metrics,
+                    record_filter=compile_record_filter(input_item.get("record_filter")),
+                    hec_sink=_hec_sink(settings),
             )
+        except requests.exceptions.RequestException as ex:
+            if tuner is not None and _is_timeout(ex):
+                tuner.on_timeout()
+                logger.warning(
+                    "Auto-tune: request timed out; next window %.0fs, page size %s",
+                    tuner.window_ms / 1000.0, tuner.page_size,
+                )
+                _save_window_checkpoint(
+                    get_checkpoint_state(ckpt_mgr, ckpt_key, logger).get("last_event_time"), count
+                )
+            raise
+        count += window_count
+        if tuner is None:
+            break
+
+        if truncated:
+            # The response stopped at 'rows': the window is only done up to
+            # its newest record, so resume there with a smaller window.
+            truncated = False
+            tuner.on_truncated()
+            resume = get_checkpoint_state(ckpt_mgr, ckpt_key, logger).get("last_event_time") or win_start
+            if resume <= win_start:
+                logger.warning(
+                    "Auto-tune: %d records share timestamp %s; skipping to the next millisecond. "
+                    "Increase 'rows' if records are being lost.",
+                    rows, win_start,
+                )
+                resume = win_start + 1
+            logger.warning(
+                "Auto-tune: window %s..%s hit the %d-record cap; resuming at %s with a %.0fs window",
+                win_start, win_end, rows, resume, tuner.window_ms / 1000.0,
+            )
+            _save_window_checkpoint(resume, count)
+            if dedupe is not None:
+                dedupe = DedupeIndex(dedupe.to_state())  # records at ``resume`` were just written
+            win_start = resume
+            continue
+
+        tuner.observe_window(win_end - win_start + 1, window_count)
+        state = tuner.to_state()
+        logger.info(
+            "Auto-tune: %d records in window; density=%s records/ms, sec_per_record=%s, "
+            "next window %.0fs, page size %s",
+            window_count, state["density"], state["sec_per_record"],
+            state["window_ms"] / 1000.0, state["page_size"],
+        )
+        if win_end >= api_end_time:
+            # Keep the record-based checkpoint for the open end of the window.
+            _save_window_checkpoint(
+                get_checkpoint_state(ckpt_mgr, ckpt_key, logger).get("last_event_time") or win_start, count
+            )
+            break
+        # A closed sub-window is complete even when it held no records.
+        _save_window_checkpoint(win_end, count)
+        win_start = win_end + 1
+    return count
+
+
+def _ingest_resource(
+    resource_uri: str,
+    ckpt_key: str,
+    event_writer: smi.EventWriter,
+    **endpoint_kwargs: Any,
+) -> int:
+    """Tail one audit resource and, with ``backfill`` on, work through its history alongside."""
+    input_item = endpoint_kwargs["input_item"]
+    if str(input_item.get("backfill", "false")).strip().lower() not in ("1", "true", "yes"):
+        return _ingest_endpoint(
+            resource_uri=resource_uri, ckpt_key=ckpt_key, event_writer=event_writer, **endpoint_kwargs
+        )
+
+    logger = endpoint_kwargs["connection"]["logger"]
+    chunk_ms = to_positive_int(input_item.get("backfill_chunk_hours"), BACKFILL_CHUNK_HOURS) * 3600 * 1000
+    plan = _backfill_plan(
+        endpoint_kwargs["ckpt_mgr"], ckpt_key, resource_uri, endpoint_kwargs["default_start"], chunk_ms, logger
+    )
+    if plan is not None:
+        # The tail starts where the backfill ends, even before its first checkpoint.
+        endpoint_kwargs["default_start"] = int(plan["end"])
+    if plan is None or plan.get("complete"):
+        return _ingest_endpoint(
+            resource_uri=resource_uri, ckpt_key=ckpt_key, event_writer=event_writer, **endpoint_kwargs
+        )
 
-            log.events_ingested(
-                    logger,
-                    input_name,
-                    sourcetype,
-                    count,
-                    input_item.get("index"),
-                    account=input_item.get("account"),
+    writer = event_writer if isinstance(event_writer, SerializedEventWriter) else SerializedEventWriter(event_writer)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"apigee_backfill_{_endpoint_key(resource_uri)}") as pool:
+        backfill = pool.submit(
+            _run_backfill, plan, resource_uri=resource_uri, ckpt_key=ckpt_key, event_writer=writer, **endpoint_kwargs
+        )
+        try:
+            return _ingest_endpoint(
+                resource_uri=resource_uri, ckpt_key=ckpt_key, event_writer=writer, **endpoint_kwargs
             )
-            log.modular_input_end(logger, norm_name)
+        finally:
+            try:
+                backfill.result()  # bounded: chunks stop at the backfill budget, within the interval
+            except Exception as e:
+                _log_ingest_error(logger, e, f"backfill of {ckpt_key}")
 
-        except Exception as e:
-            log.log_exception(
-                logger,
-                e,
-                "apigee_ingest_error",
-                msg_before=f"Exception while ingesting data for input={norm_name}: ",
+
+def _backfill_plan(
+    ckpt_mgr: CheckpointStore,
+    ckpt_key: str,
+    resource_uri: str,
+    start_ms: int,
+    chunk_ms: int,
+    logger: logging.Logger,
+) -> Optional[Dict[str, Any]]:
+    """Return the backfill plan of ``ckpt_key``, creating it on the first run; None leaves it to the tail."""
+    plan_key = f"{ckpt_key}:backfill"
+    plan = get_checkpoint_state(ckpt_mgr, plan_key, logger)
+    if plan.get("end"):
+        return plan
+    if get_checkpoint_state(ckpt_mgr, ckpt_key, logger).get("last_event_time"):
+        logger.info("Backfill not planned for %s: the input already has a live checkpoint", ckpt_key)
+        return None
+    end = now_ms()
+    if end - start_ms <= chunk_ms:
+        return None
+    plan = {
+        "start": int(start_ms),
+        "end": end,
+        "chunk_ms": int(chunk_ms),
+        "chunks": -(-(end - start_ms) // chunk_ms),  # ceil
+        "complete": False,
+        "resource_uri": resource_uri,
+        "created_human": datetime.fromtimestamp(end / 1000.0).isoformat(),
+    }
+    ckpt_mgr.update(plan_key, plan)
+    ckpt_mgr.flush()  # the tail's start point must survive a crash
+    logger.info(
+        "Backfill planned for %s: %s to %s in %d chunks",
+        ckpt_key, datetime.fromtimestamp(start_ms / 1000.0), datetime.fromtimestamp(end / 1000.0), plan["chunks"],
+    )
+    return plan
+
+
+def _run_backfill(plan: Dict[str, Any], resource_uri: str, ckpt_key: str, **endpoint_kwargs: Any) -> int:
+    """Fetch pending backfill chunks of ``plan``, oldest first; returns events written."""
+    input_item = endpoint_kwargs["input_item"]
+    ckpt_mgr: CheckpointStore = endpoint_kwargs["ckpt_mgr"]
+    logger = endpoint_kwargs["connection"]["logger"]
+    metrics = endpoint_kwargs["connection"]["metrics"]
+    plan_key = f"{ckpt_key}:backfill"
+    start, end, chunk_ms = int(plan["start"]), int(plan["end"]), int(plan["chunk_ms"])
+
+    pending = [
+        i for i in range(int(plan["chunks"]))
+        if not get_checkpoint_state(ckpt_mgr, f"{plan_key}:{i}", logger).get("done")
+    ]
+    if not pending:
+        ckpt_mgr.update(plan_key, dict(plan, complete=True))
+        logger.info("Backfill of %s complete", ckpt_key)
+        return 0
+
+    interval = to_positive_int(input_item.get("interval"), DEFAULT_INTERVAL_SEC)
+    budget = to_positive_int(input_item.get("backfill_max_run_sec"), max(1, int(interval * BACKFILL_RUN_SHARE)))
+    deadline = time.monotonic() + budget
+    # Applied on top of the shared host/org limiter, so backfill also backs off when the org is throttled.
+    limiter = AdaptiveRateLimiter(
+        max_rate=float(to_positive_int(input_item.get("backfill_max_requests_per_sec"), BACKFILL_MAX_REQUESTS_PER_SEC))
+    )
+    workers = min(len(pending), to_positive_int(input_item.get("backfill_concurrency"), BACKFILL_CONCURRENCY))
+    logger.info(
+        "Backfill of %s: %d of %d chunks pending, %d workers, %ss budget",
+        ckpt_key, len(pending), plan["chunks"], workers, budget,
+    )
+    queue_lock = threading.Lock()
+    todo = iter(pending)
+
+    def _worker() -> Tuple[int, int]:
+        events = done = 0
+        while time.monotonic() < deadline:
+            with queue_lock:
+                i = next(todo, None)
+            if i is None:
+                break
+            chunk_key = f"{plan_key}:{i}"
+            chunk_start = start + i * chunk_ms
+            chunk_end = min(chunk_start + chunk_ms, end) - 1
+            state = get_checkpoint_state(ckpt_mgr, chunk_key, logger)
+            try:
+                written = 0
+                if int(state.get("last_event_time") or 0) < chunk_end:
+                    written = _ingest_endpoint(
+                        resource_uri=resource_uri,
+                        ckpt_key=chunk_key,
+                        **dict(endpoint_kwargs, default_start=chunk_start),
+                        end_time=chunk_end,
+                        limiter=limiter,
+                        deadline=deadline,
+                    )
+            except _BackfillPaused:
+                logger.info("Backfill chunk %s paused at the run budget; it resumes on the next run", chunk_key)
+                break
+            except Exception as e:
+                # The chunk stays open and resumes from its own checkpoint on the next run.
+                _log_ingest_error(logger, e, f"backfill chunk {chunk_key}")
+                continue
+            state = get_checkpoint_state(ckpt_mgr, chunk_key, logger)
+            update_checkpoint(
+                ckpt_mgr, chunk_key, chunk_end, written or int(state.get("events_processed") or 0), logger,
+                extra={**state, "done": True},
             )
+            events += written
+            done += 1
+        return events, done
+
+    prefix = f"apigee_backfill_{_endpoint_key(resource_uri)}"
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=prefix) as pool:
+        results = [future.result() for future in [pool.submit(_worker) for _ in range(workers)]]
+    events = sum(r[0] for r in results)
+    done = sum(r[1] for r in results)
+    metrics.count("backfill_chunks_done", done)
+    metrics.count("backfill_events", events)
+    remaining = len(pending) - done
+    if not remaining:
+        ckpt_mgr.update(plan_key, dict(plan, complete=True))
+    logger.info("Backfill of %s: %d chunks done this run (%d events), %d remaining", ckpt_key, done, events, remaining)
+    return events
+
+
+def _emit_input_metrics(
+    logger: logging.Logger,
+    event_writer: smi.EventWriter,
+    input_name: str,
+    input_item: Dict[str, Any],
+    metrics: PhaseMetrics,
+    status: str,
+    index: Optional[str] = None,
+) -> None:
+    """Log one JSON metrics line for the run (lands in _internal) and, if ``index`` is set, index it there too."""
+    snapshot = metrics.snapshot()
+    elapsed = snapshot["elapsed_sec"]
+    payload = {
+        "input": input_name,
+        "account": input_item.get("account"),
+        "org": input_item.get("apigee_org_name"),
+        "resource": input_item.get("audit_resource_uri"),
+        "status": status,
+        "events_per_sec": round(snapshot.get("events_written", 0) / elapsed, 1) if elapsed else 0.0,
+        **snapshot,
+    }
+    text = json.dumps(payload, sort_keys=True)
+    logger.info("apigee_input_metrics %s", text)
+    if not index:
+        return
+    try:
+        event_writer.write_event(
+            smi.Event(
+                data=text,
+                time=f"{time.time():.3f}",
+                index=index,
+                sourcetype=METRICS_SOURCETYPE,
+                source=f"apigee_metrics:{input_name}",
+            )
+        )
+    except Exception as ex:
+        logger.warning("Failed to write metrics event: %s", ex)
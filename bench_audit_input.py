@@ -0,0 +1,543 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmark for the Apigee audit modular input.
+
+Starts a local stand-in for the Apigee audit API (``/audits/organizations/{org}/...``)
+in a separate process, serving synthetic ``auditRecord`` payloads, then drives
+``stream_events`` from audit-input.py with a stub EventWriter, an in-memory KV
+Store checkpointer and in-memory conf files. Reports events/sec, p50/p99
+latency per phase and peak RSS. With ``--hec`` events go to a local HTTP Event
+Collector stand-in (gzip bodies, optional indexer acknowledgment) instead.
+
+Needs the add-on's runtime libraries (requests, solnlib, splunklib) importable::
+
+    python bench_audit_input.py --records 200000 --inputs 4 --fetch-mode paged
+    python bench_audit_input.py --throttle-rate 0.05 --error-rate 0.01 --json
+    python bench_audit_input.py --hec --hec-ack --hec-error-rate 0.02
+
+Use ``--min-events-per-sec`` to make the run fail (exit 2) below a threshold.
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import gzip
+import itertools
+import importlib.util
+import io
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEC_TOKEN = "bench-token"
+RESOURCE_URIS = ["/developers", "/apps", "/apiproducts", "/apis", "/users", "/environments", "/keystores", "/companies"]
+ORG = "benchorg"
+
+
+# ------------------------- Mock Apigee audit API -------------------------
+
+def _make_records(args: argparse.Namespace, path: str) -> Tuple[List[int], List[bytes]]:
+    """Build the (sorted timestamps, encoded records) of one audit resource."""
+    rng = random.Random(f"{args.seed}:{path}")
+    end_ms = int(time.time() * 1000)
+    span_ms = int(args.span_hours * 3600 * 1000)
+    pad = "x" * max(0, args.record_bytes - 200)
+    stamps = sorted(end_ms - span_ms + int(span_ms * (rng.random() ** args.skew)) for _ in range(args.records))
+    bodies = []
+    for i, ts in enumerate(stamps):
+        record: Dict[str, Any] = {
+            "operation": rng.choice(("CREATE", "UPDATE", "DELETE")),
+            "request": pad,
+            "requestUri": f"/v1/organizations/{ORG}{path}/item-{i % 997}",
+            "responseCode": rng.choice(("200", "201", "204", "404")),
+            "user": f"user{i % 53}@example.com",
+        }
+        if rng.random() >= args.untimed_ratio:
+            record["timeStamp"] = ts
+        bodies.append(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+    return stamps, bodies
+
+
+def _serve_audit_api(args: argparse.Namespace, ready: Any) -> None:
+    """Child-process entry point: serve the mock API until terminated."""
+    datasets: Dict[str, Tuple[List[int], List[bytes]]] = {}
+    lock = threading.Lock()
+    prefix = f"/audits/organizations/{ORG}"
+    rng = random.Random(args.seed)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *a: Any) -> None:
+            pass
+
+        def _reply(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            url = urlsplit(self.path)
+            at = url.path.find(prefix)
+            if at < 0:
+                return self._reply(404, b'{"message":"not found"}')
+            resource_uri = url.path[at + len(prefix):]
+            with lock:
+                roll = rng.random()
+                data = datasets.get(resource_uri)
+                if data is None:
+                    data = datasets[resource_uri] = _make_records(args, resource_uri)
+            if roll < args.throttle_rate:
+                return self._reply(429, b'{"message":"quota"}', {"Retry-After": str(args.retry_after)})
+            if roll < args.throttle_rate + args.error_rate:
+                return self._reply(500, b'{"message":"error"}')
+
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            stamps, bodies = data
+            lo = bisect.bisect_left(stamps, int(query.get("startTime", 0)))
+            hi = bisect.bisect_right(stamps, int(query.get("endTime", 2 ** 62)))
+            rows = int(query.get("rows") or query.get("limit") or 10 ** 9)
+            chosen = bodies[lo:min(hi, lo + rows)]
+            if args.unordered and "sortOrder" not in query:
+                chosen = random.Random(lo).sample(chosen, len(chosen))
+            time.sleep((args.latency_ms + args.per_record_us * len(chosen) / 1000.0) / 1000.0)
+            self._reply(200, b'{"auditRecord":[' + b",".join(chosen) + b"]}")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    if args.tls:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(args.tls_cert, args.tls_key)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _serve_hec(args: argparse.Namespace, ready: Any, received: Any, received_bytes: Any) -> None:
+    """Child-process entry point: a minimal HTTP Event Collector that counts what it accepts."""
+    lock = threading.Lock()
+    rng = random.Random(args.seed + 1)
+    ack_ids = itertools.count()
+    acks: Dict[int, float] = {}  # ackId -> time it becomes acknowledged
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *a: Any) -> None:
+            pass
+
+        def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.headers.get("Authorization") != f"Splunk {HEC_TOKEN}":
+                return self._reply(401, {"text": "Invalid token", "code": 4})
+            path = urlsplit(self.path).path
+            if path == "/services/collector/ack":
+                now = time.monotonic()
+                with lock:
+                    status = {str(i): acks.get(i, float("inf")) <= now for i in json.loads(body).get("acks", [])}
+                return self._reply(200, {"acks": status})
+            if path != "/services/collector/event":
+                return self._reply(404, {"text": "The requested URL was not found on this server.", "code": 404})
+            with lock:
+                roll = rng.random()
+            if roll < args.hec_error_rate:
+                return self._reply(503, {"text": "Server is busy", "code": 9})
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            # Event payloads are JSON strings, so a bare "event": key only starts an event.
+            count = body.count(b'"event":')
+            with received.get_lock():
+                received.value += count
+            with received_bytes.get_lock():
+                received_bytes.value += len(body)
+            if not args.hec_ack:
+                return self._reply(200, {"text": "Success", "code": 0})
+            with lock:
+                ack_id = next(ack_ids)
+                acks[ack_id] = time.monotonic() + args.hec_ack_delay_ms / 1000.0
+            self._reply(200, {"text": "Success", "code": 0, "ackId": ack_id})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _self_signed_cert(directory: str) -> Tuple[str, str]:
+    cert, key = os.path.join(directory, "server.pem"), os.path.join(directory, "server.key")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return cert, key
+
+
+# ------------------------- Splunk stand-ins -------------------------
+
+class _KVConflict(Exception):
+    status = 409  # what splunklib's HTTPError carries for an insert of an existing _key
+
+
+class _MemoryCollection:
+    def __init__(self, docs: Dict[str, str]):
+        self._docs = docs
+        self._lock = threading.Lock()
+
+    def query(self, limit: int = 0, skip: int = 0, **_: Any) -> List[Dict[str, str]]:
+        items = sorted(self._docs.items())[skip:skip + limit if limit else None]
+        return [{"_key": key, "state": state} for key, state in items]
+
+    def insert(self, data: str) -> Dict[str, str]:
+        doc = json.loads(data)
+        with self._lock:
+            if doc["_key"] in self._docs:
+                raise _KVConflict(f"document {doc['_key']!r} already exists")
+            self._docs[doc["_key"]] = doc["state"]
+        return {"_key": doc["_key"]}
+
+
+class MemoryCheckpointer:
+    """In-memory stand-in for solnlib's KVStoreCheckpointer (states stored as JSON text)."""
+
+    def __init__(self, on_save: Callable[[float], None]):
+        self._docs: Dict[str, str] = {}
+        self._on_save = on_save
+        self._collection_data = _MemoryCollection(self._docs)
+
+    def get(self, key: str) -> Optional[Any]:
+        state = self._docs.get(key)
+        return None if state is None else json.loads(state)
+
+    def update(self, key: str, state: Any) -> None:
+        self.batch_update([{"_key": key, "state": state}])
+
+    def batch_update(self, states: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        for doc in states:
+            self._docs[doc["_key"]] = json.dumps(doc["state"])
+        self._on_save(time.perf_counter() - started)
+
+    def delete(self, key: str) -> None:
+        self._docs.pop(key, None)
+
+
+class _NullSink(io.TextIOBase):
+    """Text EventWriter output (like stdout) that counts events and bytes and times each write."""
+
+    def __init__(self, on_write: Callable[[float], None]):
+        super().__init__()
+        self.bytes = 0
+        self.events = 0
+        self._on_write = on_write
+
+    def write(self, data: str) -> int:
+        started = time.perf_counter()
+        self.bytes += len(data)
+        self.events += data.count("</event>")
+        self._on_write(time.perf_counter() - started)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+class _Conf:
+    def __init__(self, stanzas: Dict[str, Dict[str, Any]]):
+        self._stanzas = stanzas
+
+    def get_all(self, only_current_app: bool = False) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(body) for name, body in self._stanzas.items()}
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return dict(self._stanzas[name])
+
+
+# ------------------------- Measurement -------------------------
+
+class PhaseTimes:
+    """Latency samples per phase, safe to record from several threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.samples.setdefault(phase, []).append(seconds)
+
+    def timed(self, phase: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(phase, time.perf_counter() - started)
+        return wrapper
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for phase, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            out[phase] = {
+                "count": len(ordered),
+                "p50_ms": ordered[len(ordered) // 2] * 1000,
+                "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+                "total_s": sum(ordered),
+            }
+        return out
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+# ------------------------- Harness -------------------------
+
+def _load_addon(log_dir: str) -> Tuple[types.ModuleType, types.ModuleType]:
+    """Import utils.py (as Splunk_TA_Apigee_utils) and audit-input.py from this directory."""
+    from solnlib import log
+
+    os.makedirs(log_dir, exist_ok=True)
+    log.Logs.set_context(directory=log_dir, namespace="bench")
+
+    def _load(name: str, filename: str) -> types.ModuleType:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        return module
+
+    # Parse pool workers import utils by its add-on name, so put it on sys.path under that name.
+    alias_dir = os.path.join(log_dir, "modules")
+    alias = os.path.join(alias_dir, "Splunk_TA_Apigee_utils.py")
+    os.makedirs(alias_dir, exist_ok=True)
+    if not os.path.exists(alias):
+        try:
+            os.symlink(os.path.join(HERE, "utils.py"), alias)
+        except OSError:
+            shutil.copyfile(os.path.join(HERE, "utils.py"), alias)
+    sys.path.insert(0, alias_dir)
+    return _load("Splunk_TA_Apigee_utils", "utils.py"), _load("audit_input", "audit-input.py")
+
+
+def _input_stanzas(args: argparse.Namespace, base_url: str) -> Dict[str, Dict[str, Any]]:
+    stanzas = {}
+    for i in range(args.inputs):
+        stanzas[f"apigee://bench_{i}"] = {
+            "account": "bench",
+            "apigee_url": base_url,
+            "apigee_org_name": ORG,
+            "audit_resource_uri": RESOURCE_URIS[i % len(RESOURCE_URIS)] + ("" if i < len(RESOURCE_URIS) else f"{i}"),
+            "timestamp_fields": "timeStamp",
+            "api_params": json.dumps({"rows": str(args.page_size)}),
+            "fetch_mode": args.fetch_mode,
+            "window_shards": str(args.window_shards),
+            "start_from": "",
+            "index": "main",
+            **dict(option.split("=", 1) for option in args.input_option),
+        }
+    return stanzas
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    work_dir = tempfile.mkdtemp(prefix="apigee_bench_")
+    server = hec_server = None
+    hec_received = multiprocessing.Value("q", 0)
+    hec_bytes = multiprocessing.Value("q", 0)
+    try:
+        if args.tls:
+            args.tls_cert, args.tls_key = _self_signed_cert(work_dir)
+        ready: Any = multiprocessing.Queue()
+        server = multiprocessing.Process(target=_serve_audit_api, args=(args, ready), daemon=True)
+        server.start()
+        port = ready.get(timeout=60)
+        base_url = f"{'https' if args.tls else 'http'}://127.0.0.1:{port}/v1"
+
+        utils, audit_input = _load_addon(args.log_dir or work_dir)
+        from splunklib import modularinput as smi
+
+        times = PhaseTimes()
+        confs = {
+            utils.SETTINGS_CONF: {
+                "general": {"max_concurrent_inputs": str(args.concurrency), "validate_ssl": "false"},
+                "logging": {"loglevel": args.log_level},
+                "proxy": {"proxy_enabled": "0"},
+            },
+            utils.ACCOUNT_CONF: {"bench": {"apigee_username": "bench", "apigee_password": "bench"}},
+        }
+        if args.hec:
+            hec_ready: Any = multiprocessing.Queue()
+            hec_server = multiprocessing.Process(
+                target=_serve_hec, args=(args, hec_ready, hec_received, hec_bytes), daemon=True
+            )
+            hec_server.start()
+            confs[utils.SETTINGS_CONF]["general"].update(
+                output_mode="hec", hec_url=f"http://127.0.0.1:{hec_ready.get(timeout=60)}", hec_token=HEC_TOKEN
+            )
+        for option in args.setting:
+            name, value = option.split("=", 1)
+            confs[utils.SETTINGS_CONF]["general"][name] = value
+
+        class _ConfManager:
+            def __init__(self, *a: Any, **kw: Any):
+                pass
+
+            def get_conf(self, name: str) -> _Conf:
+                return _Conf(confs.get(name, {}))
+
+        utils.conf_manager = types.SimpleNamespace(ConfManager=_ConfManager)
+        if not args.tls:
+            audit_input.validate_input_config = lambda item, logger: None  # the mock serves plain HTTP
+        checkpointer = MemoryCheckpointer(lambda s: times.add("checkpoint_save", s))
+        utils.get_checkpoint_manager = lambda session_key: checkpointer
+        audit_input.http_get_with_retry = times.timed("http_request", audit_input.http_get_with_retry)
+        audit_input._ingest_input = times.timed("input", audit_input._ingest_input)
+
+        # Per-phase breakdown of each input run, from the input's own metrics.
+        input_times = PhaseTimes()
+        counters: Dict[str, int] = {}
+        emit_metrics = audit_input._emit_input_metrics
+
+        def _collect_metrics(logger: Any, event_writer: Any, input_name: str, input_item: Any,
+                             metrics: Any, status: str, index: Optional[str] = None) -> None:
+            snapshot = metrics.snapshot()
+            for phase, seconds in snapshot.pop("phase_sec").items():
+                input_times.add(phase, seconds)
+            for name, value in snapshot.items():
+                if isinstance(value, int):
+                    counters[name] = counters.get(name, 0) + value
+            emit_metrics(logger, event_writer, input_name, input_item, metrics, status, index)
+
+        audit_input._emit_input_metrics = _collect_metrics
+
+        definition = types.SimpleNamespace(metadata={"session_key": "bench"}, inputs=_input_stanzas(args, base_url))
+        runs = []
+        for run in range(args.runs):
+            if not args.incremental:
+                checkpointer._docs.clear()
+            utils.invalidate_conf_cache()
+            sink = _NullSink(lambda s: times.add("event_write", s))
+            writer = smi.EventWriter(output=sink, error=sys.stderr)
+            hec_before = (hec_received.value, hec_bytes.value)
+            started = time.perf_counter()
+            audit_input.stream_events(definition, writer)
+            writer.close()
+            elapsed = time.perf_counter() - started
+            events, written = sink.events, sink.bytes
+            if args.hec:
+                events, written = hec_received.value - hec_before[0], hec_bytes.value - hec_before[1]
+            runs.append({"run": run, "seconds": elapsed, "events": events, "bytes": written,
+                         "events_per_sec": events / elapsed if elapsed else 0.0})
+        best = max(runs, key=lambda r: r["events_per_sec"])
+        return {
+            "config": {k: v for k, v in vars(args).items() if not k.startswith("tls_")},
+            "runs": runs,
+            "events_per_sec": best["events_per_sec"],
+            "phases": times.summary(),
+            "input_phases": input_times.summary(),
+            "counters": counters,
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+    finally:
+        for process in (server, hec_server):
+            if process is not None:
+                process.terminate()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    for run in report["runs"]:
+        print(f"run {run['run']}: {run['events']} events in {run['seconds']:.2f}s "
+              f"({run['events_per_sec']:.0f} events/s, {run['bytes'] / 1e6:.1f} MB written)")
+    for title, phases in (("per call", report["phases"]), ("per input run", report["input_phases"])):
+        print(f"\n{title:<18}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'total s':>10}")
+        for phase, stats in phases.items():
+            print(f"{phase:<18}{stats['count']:>8}{stats['p50_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['total_s']:>10.2f}")
+    print("\n" + ", ".join(f"{name}={value}" for name, value in sorted(report["counters"].items())))
+    print(f"\nbest: {report['events_per_sec']:.0f} events/s, peak RSS {report['peak_rss_mb']:.1f} MB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=50000, help="audit records per resource")
+    parser.add_argument("--record-bytes", type=int, default=400, help="approximate size of one record")
+    parser.add_argument("--span-hours", type=float, default=24.0, help="records are spread over the last N hours")
+    parser.add_argument("--skew", type=float, default=1.0, help="timestamp skew; >1 bunches records toward the start")
+    parser.add_argument("--untimed-ratio", type=float, default=0.0, help="fraction of records without a timestamp")
+    parser.add_argument("--unordered", action="store_true", help="shuffle responses that do not ask for sortOrder")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fixed latency per response")
+    parser.add_argument("--per-record-us", type=float, default=2.0, help="extra latency per returned record")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--tls", action="store_true", help="serve HTTPS with a throwaway self-signed cert")
+    parser.add_argument("--hec", action="store_true", help="send events to a local HEC stand-in (output_mode=hec)")
+    parser.add_argument("--hec-ack", action="store_true", help="the HEC stand-in requires indexer acknowledgment")
+    parser.add_argument("--hec-ack-delay-ms", type=float, default=200.0, help="time until a batch is acknowledged")
+    parser.add_argument("--hec-error-rate", type=float, default=0.0, help="fraction of HEC posts answered with 503")
+    parser.add_argument("--inputs", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=1, help="[general] max_concurrent_inputs")
+    parser.add_argument("--fetch-mode", choices=("single", "paged"), default="single")
+    parser.add_argument("--page-size", type=int, default=1000,
+                        help="'rows' api_param; the mock caps every response at this, as Apigee does")
+    parser.add_argument("--window-shards", type=int, default=1)
+    parser.add_argument("--input-option", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra input stanza option, e.g. auto_tune=true (repeatable)")
+    parser.add_argument("--setting", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra [general] setting, e.g. json_encoder=orjson (repeatable)")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--incremental", action="store_true", help="keep checkpoints between runs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING", help="add-on log level during the run")
+    parser.add_argument("--log-dir", help="keep the add-on's log files here (default: discarded)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--min-events-per-sec", type=float, default=0.0,
+                        help="exit with status 2 when the best run is slower than this")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    warnings.filterwarnings("ignore", message="Unverified HTTPS request")  # the mock's throwaway cert
+    report = run_benchmark(args)
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        _print_report(report)
+    if args.min_events_per_sec and report["events_per_sec"] < args.min_events_per_sec:
+        print(f"FAIL: {report['events_per_sec']:.0f} events/s is below {args.min_events_per_sec:.0f}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end checks of the audit input against an in-process Apigee audit API stand-in.
+
+Needs the add-on's runtime libraries (requests, solnlib, splunklib) importable.
+"""
+from __future__ import annotations
+
+import io
+import json
+import os
+import sys
+import threading
+import time
+import types
+import xml.etree.ElementTree as ET
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("solnlib")
+pytest.importorskip("splunklib")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bench_audit_input as bench  # noqa: E402
+
+ORG = "testorg"
+
+
+class _AuditApi:
+    """Serve ``{resource: [record, ...]}`` like the Apigee audit API (ascending, ``rows`` capped)."""
+
+    def __init__(self) -> None:
+        self.records: Dict[str, List[Dict[str, Any]]] = {}
+        prefix = f"/audits/organizations/{ORG}"
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                start, end = int(query.get("startTime", 0)), int(query.get("endTime", 2 ** 62))
+                rows = int(query.get("rows") or 10 ** 9)
+                found = sorted(
+                    (r for r in api.records.get(url.path[url.path.find(prefix) + len(prefix):], [])
+                     if start <= r["timeStamp"] <= end),
+                    key=lambda r: r["timeStamp"],
+                )[:rows]
+                body = json.dumps({"auditRecord": found}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def add(self, resource_uri: str, stamps: List[int]) -> None:
+        records = self.records.setdefault(resource_uri, [])
+        first = len(records)
+        records.extend({"timeStamp": ts, "res": resource_uri, "id": first + i} for i, ts in enumerate(stamps))
+
+    def close(self) -> None:
+        self._server.shutdown()
+
+
+@pytest.fixture
+def addon(tmp_path, monkeypatch):
+    utils, audit_input = bench._load_addon(str(tmp_path))
+    confs = {
+        utils.SETTINGS_CONF: {"general": {"validate_ssl": "false"}, "logging": {"loglevel": "WARNING"}},
+        utils.ACCOUNT_CONF: {"acct": {"apigee_username": "u", "apigee_password": "p"}},
+    }
+
+    class _ConfManager:
+        def __init__(self, *a: Any, **kw: Any):
+            pass
+
+        def get_conf(self, name: str) -> bench._Conf:
+            return bench._Conf(confs.get(name, {}))
+
+    checkpointer = bench.MemoryCheckpointer(lambda seconds: None)
+    monkeypatch.setattr(utils, "conf_manager", types.SimpleNamespace(ConfManager=_ConfManager))
+    monkeypatch.setattr(utils, "get_checkpoint_manager", lambda session_key: checkpointer)
+    monkeypatch.setattr(audit_input, "validate_input_config", lambda item, logger: None)  # plain HTTP stand-in
+    api = _AuditApi()
+    yield types.SimpleNamespace(utils=utils, audit_input=audit_input, api=api, checkpointer=checkpointer)
+    api.close()
+
+
+def _run(addon: Any, inputs: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    from splunklib import modularinput as smi
+
+    out = io.StringIO()
+    writer = smi.EventWriter(output=out, error=io.StringIO())
+    addon.audit_input.stream_events(types.SimpleNamespace(metadata={"session_key": "test"}, inputs=inputs), writer)
+    writer.close()
+    if not out.getvalue():
+        return []
+    return [
+        json.loads(event.find("data").text)
+        for event in ET.fromstring(out.getvalue())
+        if event.find("sourcetype").text == "apigee:audit"
+    ]
+
+
+def _recent(addon: Any, count: int) -> List[int]:
+    """Timestamps of records that arrived since the last run (strictly in the past)."""
+    time.sleep(0.05)
+    now = addon.utils.now_ms()
+    return [now - count + i for i in range(count)]
+
+
+@pytest.mark.parametrize("tail_checkpointed", [True, False])
+def test_resource_added_mid_backfill_keeps_history(addon, monkeypatch, tail_checkpointed):
+    start = datetime.now() - timedelta(days=3)
+    start_ms = int(datetime(start.year, start.month, start.day).timestamp() * 1000)
+    now = addon.utils.now_ms()
+    addon.api.add("/base", list(range(start_ms, now - 60000, 90000)))
+    item = {
+        "account": "acct",
+        "apigee_url": addon.api.url,
+        "apigee_org_name": ORG,
+        "audit_resource_uri": "/base",
+        "timestamp_fields": "timeStamp",
+        "api_params": json.dumps({"rows": "500"}),
+        "fetch_mode": "paged",
+        "start_from": start.strftime("%Y-%m-%d"),
+        "backfill": "true",
+        "backfill_chunk_hours": "24",
+        "backfill_concurrency": "1",
+        "backfill_max_run_sec": "60",
+        "index": "main",
+    }
+    inputs = {"apigee_audit_input://in1": item}
+
+    # Only the oldest chunk gets through, so the backfill is unfinished when the resource is added.
+    ingest_endpoint = addon.audit_input._ingest_endpoint
+
+    def _failing_chunks(**kwargs: Any) -> int:
+        if ":backfill:" in kwargs["ckpt_key"] and not kwargs["ckpt_key"].endswith(":backfill:0"):
+            raise RuntimeError("chunk unavailable")
+        return ingest_endpoint(**kwargs)
+
+    monkeypatch.setattr(addon.audit_input, "_ingest_endpoint", _failing_chunks)
+    written = _run(addon, inputs)
+    if tail_checkpointed:
+        addon.api.add("/base", _recent(addon, 5))
+        written += _run(addon, inputs)
+    assert bool(addon.checkpointer.get("in1")) == tail_checkpointed
+
+    monkeypatch.setattr(addon.audit_input, "_ingest_endpoint", ingest_endpoint)
+    addon.api.add("/base", _recent(addon, 5))
+    addon.api.add("/apis", list(range(start_ms, now, 3600000)))
+    item["audit_resource_uri"] = "/base, /apis"
+    written += _run(addon, inputs)
+
+    for resource_uri, records in addon.api.records.items():
+        seen = Counter(r["id"] for r in written if r["res"] == resource_uri)
+        assert set(seen) == {r["id"] for r in records}, resource_uri
+        assert set(seen.values()) == {1}, resource_uri
+    assert addon.checkpointer.get("in1:base:backfill")["complete"]
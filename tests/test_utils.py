@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Checks of the shared helpers in utils.py (loaded as Splunk_TA_Apigee_utils).
+
+Needs the add-on's runtime libraries (requests, solnlib, splunklib) importable.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("solnlib")
+pytest.importorskip("splunklib")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bench_audit_input as bench  # noqa: E402
+
+LOGGER = logging.getLogger("test_utils")
+
+
+@pytest.fixture
+def utils(tmp_path):
+    return bench._load_addon(str(tmp_path))[0]
+
+
+# ------------------------- Lease coordination -------------------------
+
+def test_lease_claim_from_stale_read_loses(utils, monkeypatch):
+    kv = bench.MemoryCheckpointer(lambda seconds: None)
+    a = utils.LeaseCoordinator(utils.CheckpointStore(kv, LOGGER), LOGGER, node_id="a")
+    b = utils.LeaseCoordinator(utils.CheckpointStore(kv, LOGGER), LOGGER, node_id="b")
+    shards = {f"s{i}": [f"in{i}"] for i in range(8)}
+
+    # b reads the collection before a claims anything, then claims every shard as if it were alone.
+    before = b._read()
+    reads = iter([before])
+    read = b._read
+    monkeypatch.setattr(b, "_read", lambda: next(reads, None) or read())
+    assert a.rebalance(shards) == set(shards)
+    b.rebalance(shards)
+
+    assert a.held() == set(shards)
+    assert b.held() == set()
+
+
+def test_lost_lease_refuses_checkpoint_writes(utils):
+    kv = bench.MemoryCheckpointer(lambda seconds: None)
+    store_a = utils.CheckpointStore(kv, LOGGER)
+    store_b = utils.CheckpointStore(kv, LOGGER)
+    a = utils.LeaseCoordinator(store_a, LOGGER, node_id="a", ttl_sec=0.3)
+    b = utils.LeaseCoordinator(store_b, LOGGER, node_id="b", ttl_sec=0.3)
+    shards = {"s": ["in1"]}
+    assert a.rebalance(shards) == {"s"}
+    store_a.update("in1", {"last_event_time": 1})  # pending, not flushed yet
+
+    time.sleep(0.35)  # a stops renewing; its lease lapses and b claims the shard
+    kv.delete(utils._NODE_PREFIX + "a")
+    assert b.rebalance(shards) == {"s"}
+    store_b.update("in1", {"last_event_time": 2})
+    store_b.flush()
+
+    with pytest.raises(RuntimeError):
+        store_a.update("in1", {"last_event_time": 3})
+    store_a.flush()
+    assert kv.get("in1") == {"last_event_time": 2}
+    assert a.rebalance(shards) == set()
+
+
+# ------------------------- Raw passthrough -------------------------
+
+@pytest.mark.parametrize(
+    "records",
+    [
+        '{"timeStamp": 1219796950855, "user": "a"}, {"user": "b", "timeStamp": "1219796950856"}',
+        '{"\\"timeStamp": 1219796950855}',
+        '{"a\\\\": "x", "timeStamp": 1219796950855}',
+        '{"note": "say \\"timeStamp\\": 1", "timeStamp": 1219796950855}',
+        '{"note": "\\"timeStamp\\": 5"}',
+        '{"timeStamp": 1219796950855, "timeStamp": 1219796950999}',
+        '{"\\"timeStamp": 1, "timeStamp": 1219796950855}',
+        '{"x": {"timeStamp": 1219796950855}}',
+    ],
+)
+def test_scanned_records_match_decoded(utils, records):
+    fields = ["timeStamp"]
+    extract_ts = utils.compile_timestamp_extractor(fields, LOGGER)
+    text = '{"auditRecord": [' + records + "]}"
+    decoded = json.loads(text)["auditRecord"]
+    scanned = utils.RawRecordScanner(fields).scan(text)
+
+    assert scanned is not None and len(scanned) == len(decoded)
+    for raw, record in zip(scanned, decoded):
+        assert extract_ts(raw) == extract_ts(record)
+        if type(raw) is utils.RawRecord:
+            assert json.loads(raw.text) == record
+        else:
+            assert raw == record
+
+
+# ------------------------- Dedupe -------------------------
+
+def test_dedupe_state_tracks_untimed_records(utils):
+    dedupe = utils.DedupeIndex()
+    assert not dedupe.seen(None, '{"a": 1}')
+    first = dedupe.to_state()
+    assert not dedupe.seen(5, '{"b": 1}')
+    assert dedupe.to_state()["untimed"] is first["untimed"]  # unchanged digests are not re-encoded
+
+    assert not dedupe.seen(None, '{"a": 2}')
+    restored = utils.DedupeIndex(dedupe.to_state())
+    assert restored.seen(None, '{"a": 1}') and restored.seen(None, '{"a": 2}')
+    assert restored.seen(5, '{"b": 1}')
@@ -3,54 +3,215 @@
 Utilities for Splunk TA for Apigee
 
 Contains:
+- Lazy imports of requests/solnlib (with an opt-in startup import report)
+- Process-wide configuration cache
 - Logging setup and log-level discovery
 - Proxy configuration reader
 - Account details reader
 - Date/time helpers and timestamp extraction
-- HTTP helpers (cert handling + retries)
-- KVStore checkpoint helpers
+- Raw passthrough scanning of audit responses
+- HTTP helpers (cached client certs, pooled sessions, retries)
+- KVStore checkpoint helpers (write-behind checkpoint store, dedupe index)
+- Lease-based distribution of inputs across nodes sharing the KV collection
+- Event output (JSON encoders, batched XML event stream writes)
+- Bounded-memory external sort for large windows
+- Concurrency helpers (serialized event writer, per-key limits, interval scheduler)
 
 AppInspect-friendly, no sys.exit in helpers (raise instead).
 """
 from __future__ import annotations
 
+import atexit
+import base64
+import gzip
+import hashlib
+import heapq
+import importlib
+import itertools
 import json
 import logging
 import os
+import queue
+import random
 import re
+import shutil
+import socket
+import struct
+import sys
 import tempfile
+import threading
 import time
-from datetime import datetime
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+import types
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from operator import itemgetter
+from typing import (
+    IO, TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple,
+)
+from urllib.parse import urlsplit
 
-import requests
-from requests.auth import HTTPBasicAuth
+if TYPE_CHECKING:
+    from requests.auth import HTTPBasicAuth
 
-from solnlib import conf_manager, log
-from solnlib.modular_input import checkpointer
+_IMPORT_T0 = time.perf_counter()
+
+try:  # optional faster JSON encoder
+    import orjson
+except ImportError:  # pragma: no cover - depends on the Splunk Python env
+    orjson = None
 
 ADDON_NAME = "splunk_TA_Apigee"
 CHECKPOINTER_COLLECTION = "splunk_ta_apigee_checkpointer"
+SETTINGS_CONF = "splunk_ta_apigee_settings"
+ACCOUNT_CONF = "splunk_ta_apigee_account"
+CONF_CACHE_TTL_SEC = 300.0
+
+
+
+# ------------------------- Lazy imports -------------------------
+
+# requests, solnlib and splunklib cost a few hundred ms to import; scheme and
+# validation calls never need them, so they load on first attribute access.
+# With this variable set, a startup report is written to stderr at exit.
+IMPORT_PROFILE_ENV = "SPLUNK_TA_APIGEE_IMPORT_PROFILE"
+_IMPORT_LOCK = threading.RLock()
+_IMPORT_TIMES: List[Tuple[str, float, float, str]] = []  # (module, load sec, since start sec, first use)
+_LAZY_MODULES: Dict[str, types.ModuleType] = {}
+
+
+class _LazyModule(types.ModuleType):
+    """Stand-in for a module that imports the real one on first attribute access."""
+
+    def __getattr__(self, attr: str) -> Any:
+        module = self.__dict__.get("_lazy_target")
+        if module is None:
+            with _IMPORT_LOCK:
+                module = self.__dict__.get("_lazy_target")
+                if module is None:
+                    loaded = self.__name__ in sys.modules
+                    started = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    if not loaded:
+                        _IMPORT_TIMES.append(
+                            (self.__name__, time.perf_counter() - started, started - _IMPORT_T0, attr)
+                        )
+                    self.__dict__["_lazy_target"] = module
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Return ``name`` if it is already imported, else a stand-in that imports it on first use."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _IMPORT_LOCK:
+        return _LAZY_MODULES.setdefault(name, _LazyModule(name))
+
+
+def import_profile_report() -> str:
+    """``-X importtime``-style lines for each deferred import, in load order."""
+    lines = ["import time: since start [us] | load [us] | module (first use)"]
+    for name, seconds, since_start, attr in list(_IMPORT_TIMES):
+        lines.append(f"import time: {since_start * 1e6:>14.0f} | {seconds * 1e6:>9.0f} | {name} ({attr})")
+    lines.append(f"import time: process alive {(time.perf_counter() - _IMPORT_T0) * 1e3:.1f} ms after utils import")
+    return "\n".join(lines)
+
+
+def _write_import_profile() -> None:
+    try:
+        sys.stderr.write(import_profile_report() + "\n")
+    except Exception:
+        pass
+
+
+if os.environ.get(IMPORT_PROFILE_ENV):
+    atexit.register(_write_import_profile)
+
+requests = lazy_import("requests")
+ssl = lazy_import("ssl")
+cookiejar = lazy_import("http.cookiejar")
+email_utils = lazy_import("email.utils")
+conf_manager = lazy_import("solnlib.conf_manager")
+log = lazy_import("solnlib.log")
+checkpointer = lazy_import("solnlib.modular_input.checkpointer")
+multiprocessing = lazy_import("multiprocessing")
+futures_process = lazy_import("concurrent.futures.process")
+
+
+def _utils_logger() -> logging.Logger:
+    return log.Logs().get_logger(f"{ADDON_NAME.lower()}_utils")
+
+
+# ------------------------- Configuration cache -------------------------
+
+class ConfCache:
+    """Whole-file conf reads shared by every input in the process, cached for ``ttl_sec``."""
+
+    def __init__(self, ttl_sec: float = CONF_CACHE_TTL_SEC):
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        self._entries: Dict[str, Tuple[float, Dict[str, Dict[str, Any]]]] = {}
+
+    def _fresh(self, conf_name: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        entry = self._entries.get(conf_name)
+        if entry and time.monotonic() - entry[0] < self.ttl_sec:
+            return entry[1]
+        return None
+
+    def get_all(self, session_key: str, conf_name: str) -> Dict[str, Dict[str, Any]]:
+        stanzas = self._fresh(conf_name)
+        if stanzas is not None:
+            return stanzas
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(conf_name, threading.Lock())
+        with fetch_lock:
+            stanzas = self._fresh(conf_name)
+            if stanzas is not None:
+                return stanzas
+            cfm = conf_manager.ConfManager(
+                session_key,
+                ADDON_NAME,
+                realm=f"__REST_CREDENTIAL__#{ADDON_NAME}#configs/conf-{conf_name}",
+            )
+            stanzas = {name: dict(body) for name, body in cfm.get_conf(conf_name).get_all().items()}
+            self._entries[conf_name] = (time.monotonic(), stanzas)
+            return stanzas
+
+    def invalidate(self, conf_name: Optional[str] = None) -> None:
+        """Drop one conf file (or all of them) so the next lookup re-reads splunkd."""
+        with self._lock:
+            if conf_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(conf_name, None)
 
-# Module-level logger for utilities
-_LOGGER = log.Logs().get_logger(f"{ADDON_NAME.lower()}_utils")
+
+_CONF_CACHE = ConfCache()
+
+
+def get_conf_stanzas(session_key: str, conf_name: str) -> Dict[str, Dict[str, Any]]:
+    """Return every stanza of ``conf_name`` from the process-wide conf cache."""
+    return _CONF_CACHE.get_all(session_key, conf_name)
+
+
+def invalidate_conf_cache(conf_name: Optional[str] = None) -> None:
+    """Force the next lookup of ``conf_name`` (default: every conf) to hit splunkd."""
+    _CONF_CACHE.invalidate(conf_name)
 
 
 # ------------------------- Logging -------------------------
 
-def get_log_level(session_key: str) -> str:
-    """Fetch addon log level from settings conf. Fallback to DEBUG."""
+def get_log_level(session_key: str, default: str = "DEBUG") -> str:
+    """Fetch addon log level from settings conf. Fallback to ``default``."""
     try:
-        cfm = conf_manager.ConfManager(
-            session_key,
-            ADDON_NAME,
-            realm=f"__REST_CREDENTIAL__#{ADDON_NAME}#configs/conf-splunk_ta_apigee_settings",
-        )
-        conf = cfm.get_conf("splunk_ta_apigee_settings")
-        logging_details = conf.get("logging")
-        return logging_details.get("loglevel", "DEBUG")
+        logging_details = get_conf_stanzas(session_key, SETTINGS_CONF).get("logging") or {}
+        return logging_details.get("loglevel") or default
     except Exception as e:  # noqa: F841 - best-effort only
-        return "DEBUG"
+        return default
 
 
 def set_logger(session_key: str, filename: str) -> logging.Logger:
@@ -65,13 +226,7 @@ def set_logger(session_key: str, filename: str) -> logging.Logger:
 def get_proxy_settings(logger: logging.Logger, session_key: str) -> Optional[Dict[str, str]]:
     """Read proxy settings from splunk_ta_apigee_settings.conf [proxy]."""
     try:
-        cfm = conf_manager.ConfManager(
-            session_key,
-            ADDON_NAME,
-            realm=f"__REST_CREDENTIAL__#{ADDON_NAME}#configs/conf-splunk_ta_apigee_settings",
-        )
-        conf_all = cfm.get_conf("splunk_ta_apigee_settings").get_all()
-        stanza = dict(conf_all.get("proxy", {}))
+        stanza = dict(get_conf_stanzas(session_key, SETTINGS_CONF).get("proxy", {}))
 
         if int(str(stanza.get("proxy_enabled", 0))) == 0:
             logger.info("Proxy disabled; returning None")
@@ -116,13 +271,11 @@ def get_account_details(logger: logging.Logger, session_key: str, account_name:
       - apigee_ssl_client_cert_path, apigee_ssl_key_path (optional file paths)
     """
     try:
-        cfm = conf_manager.ConfManager(
-            session_key,
-            ADDON_NAME,
-            realm=f"__REST_CREDENTIAL__#{ADDON_NAME}#configs/conf-splunk_ta_apigee_account",
-        )
-        account_conf = cfm.get_conf("splunk_ta_apigee_account")
-        account_data = account_conf.get(account_name)
+        account_data = get_conf_stanzas(session_key, ACCOUNT_CONF).get(account_name)
+        if not account_data:
+            # The account may have been created since the conf was cached.
+            invalidate_conf_cache(ACCOUNT_CONF)
+            account_data = get_conf_stanzas(session_key, ACCOUNT_CONF).get(account_name)
         if not account_data:
             raise KeyError(f"Account '{account_name}' not found")
         return dict(account_data)
@@ -232,8 +385,630 @@ def extract_timestamp_from_event(
     return None
 
 
+_EPOCH_MS_FLOOR = 946684800000  # 2000-01-01 in ms; smaller numbers are epoch seconds
+_TS_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S.%fZ",
+    "%Y-%m-%dT%H:%M:%SZ",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+)
+
+
+class TimestampExtractor:
+    """Compiled equivalent of ``extract_timestamp_from_event`` for a fixed field list."""
+
+    def __init__(self, timestamp_fields: List[str], logger: logging.Logger):
+        self.timestamp_fields = list(timestamp_fields)
+        # (field, top-level key, remaining path parts)
+        self._paths = [(field, *self._split(field)) for field in self.timestamp_fields]
+        self._learned: Dict[str, str] = {}
+        self._logger = logger
+
+    @staticmethod
+    def _split(field: str) -> Tuple[str, Tuple[str, ...]]:
+        head, *rest = field.split(".")
+        return head, tuple(rest)
+
+    def __call__(self, event: Dict[str, Any]) -> Optional[int]:
+        if type(event) is RawRecord:
+            event = event.fields
+        elif not isinstance(event, dict):
+            return None
+        for field_path, head, rest in self._paths:
+            try:
+                value: Any = event.get(head)
+                for part in rest:
+                    if value is None:
+                        break
+                    value = value.get(part) if isinstance(value, dict) else None
+                if value is None:
+                    continue
+
+                if type(value) is int and value > _EPOCH_MS_FLOOR:
+                    return value
+                if isinstance(value, (int, float)):
+                    return int(value if value > _EPOCH_MS_FLOOR else value * 1000)
+                if isinstance(value, str):
+                    ts = self._parse_str(field_path, value)
+                    if ts is not None:
+                        return ts
+                self._logger.debug("Found timestamp field '%s' but could not parse: %s", field_path, value)
+            except Exception as ex:
+                self._logger.debug("Error extracting timestamp from '%s': %s", field_path, ex)
+        return None
+
+    def _parse_str(self, field_path: str, value: str) -> Optional[int]:
+        iso_like = "T" in value and ("Z" in value or "+" in value)
+        learned = None if iso_like else self._learned.get(field_path)
+        if learned is not None:
+            # A string that matches one of _TS_FORMATS can never parse as a
+            # float, so trying it before float() cannot change the result.
+            try:
+                return int(datetime.strptime(value, learned).timestamp() * 1000)
+            except ValueError:
+                pass
+        try:
+            if iso_like:
+                dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                return int(dt.timestamp() * 1000)
+            num = float(value)
+            return int(num if num > _EPOCH_MS_FLOOR else num * 1000)
+        except Exception:
+            for fmt in _TS_FORMATS:
+                if fmt == learned:
+                    continue
+                try:
+                    dt = datetime.strptime(value, fmt)
+                except ValueError:
+                    continue
+                self._learned[field_path] = fmt
+                return int(dt.timestamp() * 1000)
+        return None
+
+
+_EXTRACTORS: Dict[Tuple[Tuple[str, ...], str], TimestampExtractor] = {}
+
+
+def compile_timestamp_extractor(timestamp_fields: List[str], logger: logging.Logger) -> TimestampExtractor:
+    """Return the shared compiled extractor for these fields and logger."""
+    key = (tuple(timestamp_fields), logger.name)
+    extractor = _EXTRACTORS.get(key)
+    if extractor is None:
+        extractor = _EXTRACTORS.setdefault(key, TimestampExtractor(timestamp_fields, logger))
+    return extractor
+
+
+# ------------------------- Raw passthrough -------------------------
+
+_JSON_WS = r"[ \t\n\r]*"
+_JSON_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_JSON_SCALAR = r'(?:' + _JSON_STRING + r'|[^,{}\[\]"\s]+)'
+_AUDIT_HEAD_RE = re.compile(r"\A" + _JSON_WS + r"\{" + _JSON_WS + r'"auditRecord"' + _JSON_WS + ":" + _JSON_WS + r"\[")
+# What may follow the auditRecord array: more scalar members, then the end of the object.
+_AUDIT_TAIL_RE = re.compile(
+    r"\]" + _JSON_WS + r"(?:," + _JSON_WS + _JSON_STRING + _JSON_WS + ":" + _JSON_WS + _JSON_SCALAR + _JSON_WS + r")*"
+    r"\}" + _JSON_WS + r"\Z"
+)
+_RECORD_SEP_RE = re.compile(r"\}" + _JSON_WS + "," + _JSON_WS + r"\{")
+_WS_RE = re.compile(_JSON_WS)
+_MAX_RECORD_PIECES = 64  # separators one record may span before the scan gives up
+
+
+class RawRecord(NamedTuple):
+    """An audit record kept as its original JSON text, plus the decoded top-level timestamp ``fields``."""
+
+    text: str
+    fields: Dict[str, Any]
+
+
+def _json_scalar(token: str) -> Any:
+    if token[0] == '"' and "\\" not in token:
+        return token[1:-1]
+    if token.isascii() and token.isdigit() and (token[0] != "0" or len(token) == 1):
+        return int(token)
+    return json.loads(token)
+
+
+def _escaped_quotes(text: str, start: int = 0, end: Optional[int] = None) -> int:
+    # Quotes preceded by an odd number of backslashes: with c(k) the number of
+    # quotes preceded by at least k backslashes, that is c(1) - c(2) + c(3) ...
+    total, sign, run = 0, 1, '\\"'
+    end = len(text) if end is None else end
+    while True:
+        found = text.count(run, start, end)
+        if not found:
+            return total
+        total += sign * found
+        sign, run = -sign, "\\" + run
+
+
+def _quote_escaped(text: str, at: int) -> bool:
+    """Whether the quote at ``at`` is preceded by an odd number of backslashes."""
+    run = at
+    while run and text[run - 1] == "\\":
+        run -= 1
+    return (at - run) % 2 == 1
+
+
+def _audit_array_bounds(text: str) -> Optional[Tuple[int, int]]:
+    """Return the span of the ``auditRecord`` elements in a ``{"auditRecord": [...]}`` response."""
+    head = _AUDIT_HEAD_RE.match(text)
+    end = text.rfind("]")
+    if head is None or end < head.end() - 1 or not _AUDIT_TAIL_RE.match(text, end):
+        return None
+    if text.count('"auditRecord"') != 1:
+        return None
+    lo = _WS_RE.match(text, head.end(), end).end()
+    hi = end
+    while hi > lo and text[hi - 1] in " \t\n\r":
+        hi -= 1
+    return lo, hi
+
+
+class RawRecordScanner:
+    """Split an audit response into its ``auditRecord`` elements without decoding them."""
+
+    def __init__(self, timestamp_fields: List[str]):
+        heads = sorted({field.split(".")[0] for field in timestamp_fields})
+        self._keys = [
+            (
+                head,
+                json.dumps(head),
+                re.compile(re.escape(json.dumps(head)) + _JSON_WS + ":" + _JSON_WS + "(" + _JSON_SCALAR + ")"),
+            )
+            for head in heads
+        ]
+        self._ts_key_re = re.compile('"ts"' + _JSON_WS + ":")
+
+    def scan(self, text: str) -> Optional[List[Any]]:
+        """Return the records of a ``{"auditRecord": [...]}`` response, or None for any other shape."""
+        bounds = _audit_array_bounds(text)
+        if bounds is None:
+            return None
+        lo, hi = bounds
+        records: List[Any] = []
+        if lo == hi:
+            return records
+        if text[lo] != "{" or text[hi - 1] != "}":
+            return None
+
+        # Response-wide searches let most records skip the matching per-record check.
+        checks = (
+            "\\" in text,
+            text.find("[", lo, hi) >= 0 or text.find("]", lo, hi) >= 0,
+            '"ts"' in text,
+        )
+        record_at = self._record
+        start, pieces = lo, 0
+        try:
+            for sep in _RECORD_SEP_RE.finditer(text, lo, hi):
+                record = record_at(text[start:sep.start() + 1], checks)
+                if record is None:
+                    pieces += 1
+                    if pieces >= _MAX_RECORD_PIECES:
+                        return None
+                    continue
+                records.append(record)
+                start, pieces = sep.end() - 1, 0
+            record = record_at(text[start:hi], checks)
+        except ValueError:
+            return None
+        if record is None:
+            return None
+        records.append(record)
+        return records
+
+    def _record(self, raw: str, checks: Tuple[bool, bool, bool]) -> Any:
+        """Return the record for ``raw``, or None when ``raw`` is not one whole object."""
+        escapes, brackets, ts_key = checks
+        quotes = raw.count('"')
+        if escapes and "\\" in raw:
+            quotes -= _escaped_quotes(raw)
+        if quotes % 2:
+            return None  # cut inside a string
+        if (
+            raw.find("{", 1) >= 0
+            or raw.find("}", 0, len(raw) - 1) >= 0
+            or (brackets and ("[" in raw or "]" in raw))
+        ):
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                return None  # cut inside a nested value
+            if "ts" in record:
+                return record
+            return tuple.__new__(RawRecord, (raw, record))
+        if ts_key and '"ts"' in raw and self._ts_key_re.search(raw):
+            return json.loads(raw)
+        fields: Dict[str, Any] = {}
+        for head, token, key_re in self._keys:
+            at = raw.find(token)
+            if at < 0:
+                continue
+            match = self._key_match(key_re, raw, at, escapes)
+            if match is None:
+                continue
+            if raw.find(token, match.end()) >= 0 and self._key_match(key_re, raw, match.end(), escapes):
+                return json.loads(raw)  # repeated key: the last one wins
+            fields[head] = _json_scalar(match.group(1))
+        # tuple.__new__ skips the Python-level NamedTuple constructor.
+        return tuple.__new__(RawRecord, (raw, fields))
+
+    @staticmethod
+    def _key_match(key_re: "re.Pattern", raw: str, at: int, escapes: bool) -> Any:
+        """First ``key_re`` match from ``at`` that opens at an unescaped quote, i.e. a whole key."""
+        match = key_re.search(raw, at)
+        while escapes and match is not None and _quote_escaped(raw, match.start()):
+            match = key_re.search(raw, match.start() + 1)
+        return match
+
+
+_SCANNERS: Dict[Tuple[str, ...], RawRecordScanner] = {}
+
+
+def compile_record_scanner(timestamp_fields: List[str]) -> RawRecordScanner:
+    """Return the shared raw record scanner for these timestamp fields."""
+    key = tuple(timestamp_fields)
+    scanner = _SCANNERS.get(key)
+    if scanner is None:
+        scanner = _SCANNERS.setdefault(key, RawRecordScanner(timestamp_fields))
+    return scanner
+
+
+# ------------------------- Record filter -------------------------
+
+_FILTER_MATCHERS = {
+    # spec key: (record field, kind)
+    "operations": ("operation", "exact"),
+    "users": ("user", "regex"),
+    "request_uris": ("requestUri", "regex"),
+    "response_codes": ("responseCode", "code"),
+}
+_FILTER_FIELD_KEYS = ("keep_fields", "drop_fields")
+_CODE_CLASS_RE = re.compile(r"[1-5]xx", re.IGNORECASE)
+
+
+class RecordFilter:
+    """Per-input record filter and field projection, applied before serialization.
+
+    The spec is a JSON object of include/exclude rules plus ``keep_fields``/``drop_fields``.
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        if not isinstance(spec, dict):
+            raise ValueError("record filter must be a JSON object")
+        known = set(_FILTER_FIELD_KEYS)
+        for key in _FILTER_MATCHERS:
+            known.update((key, f"exclude_{key}"))
+        unknown = sorted(set(spec) - known)
+        if unknown:
+            raise ValueError(f"unknown record filter keys: {unknown}")
+        self._rules: List[Tuple[str, Callable[[Any], bool], bool]] = []
+        for key, (field, kind) in _FILTER_MATCHERS.items():
+            for spec_key, include in ((key, True), (f"exclude_{key}", False)):
+                values = spec.get(spec_key)
+                if values in (None, []):
+                    continue
+                self._rules.append((field, self._matcher(spec_key, kind, _filter_list(spec_key, values)), include))
+        self.keep_fields = set(_filter_list("keep_fields", spec.get("keep_fields") or []))
+        self.drop_fields = set(_filter_list("drop_fields", spec.get("drop_fields") or []))
+
+    @staticmethod
+    def _matcher(key: str, kind: str, values: List[str]) -> Callable[[Any], bool]:
+        if kind == "exact":
+            names = {v.upper() for v in values}
+            return lambda value: str(value).upper() in names
+        if kind == "regex":
+            try:
+                patterns = [re.compile(v) for v in values]
+            except re.error as ex:
+                raise ValueError(f"{key}: invalid regular expression: {ex}")
+            return lambda value: any(p.search(str(value)) for p in patterns)
+        codes = {v for v in values if not _CODE_CLASS_RE.fullmatch(v)}
+        classes = {v[0] for v in values if _CODE_CLASS_RE.fullmatch(v)}
+        bad = [v for v in codes if not v.isdigit()]
+        if bad:
+            raise ValueError(f"{key}: expected status codes or classes like '4xx', got {bad}")
+
+        def _code(value: Any) -> bool:
+            text = str(value).strip()
+            return text in codes or (len(text) == 3 and text[0] in classes)
+
+        return _code
+
+    def apply(self, record: Any) -> Any:
+        """Return the record to write (possibly trimmed), or None to drop it."""
+        values = json.loads(record.text) if type(record) is RawRecord else record
+        if not isinstance(values, dict):
+            return None if any(include for _, _, include in self._rules) else record
+        for field, test, include in self._rules:
+            value = values.get(field)
+            if (value is not None and test(value)) is not include:
+                return None
+        kept = values
+        if self.keep_fields:
+            kept = {k: v for k, v in kept.items() if k in self.keep_fields}
+        if self.drop_fields and not self.drop_fields.isdisjoint(kept):
+            kept = {k: v for k, v in kept.items() if k not in self.drop_fields}
+        return record if len(kept) == len(values) else kept
+
+
+def _filter_list(key: str, values: Any) -> List[str]:
+    if isinstance(values, (str, int)):
+        values = [values]
+    if not isinstance(values, list) or not all(isinstance(v, (str, int)) for v in values):
+        raise ValueError(f"{key} must be a string or a list of strings")
+    return [str(v).strip() for v in values]
+
+
+_FILTERS: Dict[str, Optional[RecordFilter]] = {}
+
+
+def compile_record_filter(spec: Any) -> Optional[RecordFilter]:
+    """Return the shared ``RecordFilter`` for a JSON spec (None when empty); raises ValueError if invalid."""
+    if isinstance(spec, dict):
+        spec = json.dumps(spec, sort_keys=True)
+    text = str(spec or "").strip()
+    if not text or text == "{}":
+        return None
+    if text not in _FILTERS:
+        try:
+            parsed = json.loads(text)
+        except ValueError as ex:
+            raise ValueError(f"record filter must be valid JSON: {ex}")
+        _FILTERS[text] = RecordFilter(parsed) if parsed else None
+    return _FILTERS[text]
+
+
+# ------------------------- Parallel parse -------------------------
+
+PARSE_PARALLEL_MIN_BYTES = 16 * 1024 * 1024  # smaller responses decode faster in-process
+_PARSE_LOGGER = f"{ADDON_NAME.lower()}_parse"
+_PARSE_POOL: Optional[Any] = None
+_PARSE_POOL_WORKERS = 0
+_PARSE_POOL_LOCK = threading.Lock()
+
+
+def _split_audit_array(text: str, parts: int) -> Optional[List[str]]:
+    """Cut the ``auditRecord`` array of a response into at most ``parts`` runs; None for other shapes."""
+    bounds = _audit_array_bounds(text)
+    if bounds is None:
+        return None
+    lo, hi = bounds
+    if lo == hi or text[lo] != "{" or text[hi - 1] != "}":
+        return None
+    escapes = "\\" in text
+    step = (hi - lo) // parts
+    chunks: List[str] = []
+    start = lo
+    for i in range(1, parts):
+        pos = max(lo + i * step, start)
+        quotes, counted = 0, start
+        while True:
+            sep = _RECORD_SEP_RE.search(text, pos, hi)
+            if sep is None:
+                break
+            cut = sep.start() + 1
+            quotes += text.count('"', counted, cut)
+            if escapes:
+                quotes -= _escaped_quotes(text, counted, cut)
+            counted = cut
+            if not quotes % 2:
+                break
+            pos = sep.end() - 1
+        if sep is None:
+            break
+        chunks.append(text[start:cut])
+        start = sep.end() - 1
+    chunks.append(text[start:hi])
+    return chunks
+
+
+def _parse_audit_chunk(
+    chunk: str, timestamp_fields: List[str], json_encoder: str, passthrough: bool
+) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], List[Tuple[str, Dict[str, Any]]]]:
+    """Process-pool worker: decode, timestamp and serialize one run; returns ``(timed, untimed)``."""
+    extract_ts = compile_timestamp_extractor(timestamp_fields, logging.getLogger(_PARSE_LOGGER))
+    if passthrough:
+        records = compile_record_scanner(timestamp_fields).scan('{"auditRecord":[' + chunk + "]}")
+        if records is None:
+            raise ValueError("audit records could not be scanned")
+    else:
+        records = json.loads("[" + chunk + "]")
+    encode = make_json_encoder(json_encoder)
+    heads = sorted({field.split(".")[0] for field in timestamp_fields})
+    timed: List[Tuple[int, str, Dict[str, Any]]] = []
+    untimed: List[Tuple[str, Dict[str, Any]]] = []
+    for record in records:
+        ts = extract_ts(record)
+        if type(record) is RawRecord:
+            text, values = record
+        else:
+            values = record if isinstance(record, dict) else {}
+            if ts and "ts" in record:
+                record = {k: v for k, v in record.items() if k != "ts"}
+            text = encode(record)
+        fields = {head: values[head] for head in heads if head in values}
+        if ts:
+            timed.append((ts, text, fields))
+        else:
+            untimed.append((text, fields))
+    timed.sort(key=itemgetter(0))
+    return timed, untimed
+
+
+def _parse_pool(workers: int) -> Any:
+    """Return the process-wide parse pool, (re)creating it for ``workers`` processes."""
+    global _PARSE_POOL, _PARSE_POOL_WORKERS
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None or _PARSE_POOL_WORKERS != workers:
+            if _PARSE_POOL is not None:
+                _PARSE_POOL.shutdown(wait=False)
+            # Never plain fork: the parent runs fetch, writer and timer threads.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _PARSE_POOL = futures_process.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _PARSE_POOL_WORKERS = workers
+        return _PARSE_POOL
+
+
+def _discard_parse_pool(pool: Any) -> None:
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is pool:
+            _PARSE_POOL = None
+    pool.shutdown(wait=False)
+
+
+class ParallelParser:
+    """Decode large audit responses on a shared process pool; smaller ones are left to the caller (None)."""
+
+    def __init__(
+        self,
+        workers: int,
+        timestamp_fields: List[str],
+        logger: logging.Logger,
+        json_encoder: str = "json",
+        passthrough: bool = False,
+        min_bytes: int = PARSE_PARALLEL_MIN_BYTES,
+    ):
+        self.workers = min(workers, os.cpu_count() or 1)
+        self.timestamp_fields = list(timestamp_fields)
+        self.json_encoder = json_encoder
+        self.passthrough = passthrough
+        self.min_bytes = min_bytes
+        self._logger = logger
+
+    def parse(self, text: str) -> Optional[List[RawRecord]]:
+        """Return the records of ``text`` in timestamp order (untimed last), or None to decode in-process."""
+        if self.workers < 2 or len(text) < self.min_bytes:
+            return None
+        chunks = _split_audit_array(text, self.workers)
+        if chunks is None or len(chunks) < 2:
+            return None
+        pool = None
+        futures: List[Any] = []
+        try:
+            pool = _parse_pool(self.workers)
+            futures = [
+                pool.submit(_parse_audit_chunk, chunk, self.timestamp_fields, self.json_encoder, self.passthrough)
+                for chunk in chunks
+            ]
+            del chunks
+            results = [future.result() for future in futures]
+        except Exception as ex:
+            for future in futures:
+                future.cancel()
+            if isinstance(ex, ValueError):
+                self._logger.debug("Parallel parse declined, decoding in-process: %s", ex)
+                return None
+            if pool is not None and isinstance(ex, futures_process.BrokenProcessPool):
+                _discard_parse_pool(pool)
+            self._logger.warning("Parallel parse failed, decoding in-process: %s", ex)
+            return None
+        new = tuple.__new__  # skips the Python-level NamedTuple constructor
+        records = [
+            new(RawRecord, (payload, fields))
+            for _, payload, fields in heapq.merge(*(timed for timed, _ in results), key=itemgetter(0))
+        ]
+        for _, untimed in results:
+            records.extend(new(RawRecord, item) for item in untimed)
+        return records
+
+
 # ------------------------- HTTP helpers -------------------------
 
+# MASSL PEM material is written once per distinct cert/key pair into a
+# private (0700) directory and reused by every call and input in the process.
+_CERT_LOCK = threading.Lock()
+_CERT_DIR: Optional[str] = None
+_CERT_FILES: Dict[str, Tuple[str, str]] = {}  # digest -> (cert path, key path)
+_CERT_DIGESTS: Dict[str, str] = {}  # cert path -> digest
+_CERT_BY_ACCOUNT: Dict[str, str] = {}  # account -> digest
+_SSL_CONTEXTS: Dict[Tuple[str, bool], ssl.SSLContext] = {}
+
+
+def _write_private_file(path: str, data: bytes) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+
+
+def _cached_cert_files(logger: logging.Logger, account_name: str, cert_pem: str, key_pem: str) -> Tuple[str, str]:
+    global _CERT_DIR
+    cert_bytes = cert_pem.encode("utf-8")
+    key_bytes = key_pem.encode("utf-8")
+    digest = hashlib.sha256(cert_bytes + b"\0" + key_bytes).hexdigest()
+
+    with _CERT_LOCK:
+        previous = _CERT_BY_ACCOUNT.get(account_name)
+        _CERT_BY_ACCOUNT[account_name] = digest
+        if previous and previous != digest and previous not in _CERT_BY_ACCOUNT.values():
+            logger.info("Client certificate for account %s changed; evicting cached copy", account_name)
+            _evict_cert_locked(previous)
+
+        paths = _CERT_FILES.get(digest)
+        if paths and all(os.path.isfile(p) for p in paths):
+            return paths
+
+        if _CERT_DIR is None or not os.path.isdir(_CERT_DIR):
+            _CERT_DIR = tempfile.mkdtemp(prefix=f"{ADDON_NAME}_certs_")  # created 0700
+        paths = (
+            os.path.join(_CERT_DIR, f"{digest[:32]}_cert.pem"),
+            os.path.join(_CERT_DIR, f"{digest[:32]}_key.key"),
+        )
+        _write_private_file(paths[0], cert_bytes)
+        _write_private_file(paths[1], key_bytes)
+        _CERT_FILES[digest] = paths
+        _CERT_DIGESTS[paths[0]] = digest
+        logger.debug("Materialized client cert/key for account %s", account_name)
+        return paths
+
+
+def _evict_cert_locked(digest: str) -> None:
+    paths = _CERT_FILES.pop(digest, None)
+    for path in paths or ():
+        _CERT_DIGESTS.pop(path, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    for key in [k for k in _SSL_CONTEXTS if k[0] == digest]:
+        del _SSL_CONTEXTS[key]
+    _drop_http_sessions(lambda key: key[2] == digest)
+
+
+def clear_cert_cache() -> None:
+    """Forget every cached cert/key pair and remove the private cert directory."""
+    global _CERT_DIR
+    with _CERT_LOCK:
+        for digest in list(_CERT_FILES):
+            _evict_cert_locked(digest)
+        _CERT_BY_ACCOUNT.clear()
+        if _CERT_DIR:
+            shutil.rmtree(_CERT_DIR, ignore_errors=True)
+            _CERT_DIR = None
+
+
+atexit.register(clear_cert_cache)
+
+
+def get_client_ssl_context(cert: Tuple[str, str], verify_ssl: bool) -> ssl.SSLContext:
+    """Return a cached SSLContext with the client cert chain loaded."""
+    key = (_cert_fingerprint(cert), bool(verify_ssl))
+    with _CERT_LOCK:
+        ctx = _SSL_CONTEXTS.get(key)
+        if ctx is None:
+            ctx = ssl.create_default_context(cafile=requests.certs.where() if verify_ssl else None)
+            if not verify_ssl:
+                ctx.check_hostname = False
+                ctx.verify_mode = ssl.CERT_NONE
+            ctx.load_cert_chain(cert[0], cert[1])
+            _SSL_CONTEXTS[key] = ctx
+    return ctx
+
+
 def build_cert_files(
     logger: logging.Logger,
     account_name: str,
@@ -242,7 +1017,11 @@ def build_cert_files(
     client_cert_path: Optional[str] = None,
     client_key_path: Optional[str] = None,
 ) -> Tuple[Optional[Tuple[str, str]], List[str]]:
-    """Return (cert_tuple, temp_files) usable by requests."""
+    """Return (cert_tuple, temp_files) usable by requests.
+
+    PEM text is materialized through the process-wide cert cache, so the
+    returned temp file list is empty and the files outlive the call.
+    """
     temps: List[str] = []
 
     if client_cert_path and client_key_path and os.path.isfile(client_cert_path) and os.path.isfile(client_key_path):
@@ -250,20 +1029,7 @@ def build_cert_files(
         return (client_cert_path, client_key_path), temps
 
     if client_cert_pem and client_key_pem:
-        cert_tmp = tempfile.NamedTemporaryFile(prefix=f"{ADDON_NAME}_{account_name}_cert_", suffix=".pem", delete=False)
-        key_tmp = tempfile.NamedTemporaryFile(prefix=f"{ADDON_NAME}_{account_name}_key_", suffix=".key", delete=False)
-        try:
-            cert_tmp.write(client_cert_pem.encode("utf-8"))
-            cert_tmp.flush()
-            key_tmp.write(client_key_pem.encode("utf-8"))
-            key_tmp.flush()
-        finally:
-            cert_tmp.close()
-            key_tmp.close()
-        os.chmod(cert_tmp.name, 0o600)
-        os.chmod(key_tmp.name, 0o600)
-        temps.extend([cert_tmp.name, key_tmp.name])
-        return (cert_tmp.name, key_tmp.name), temps
+        return _cached_cert_files(logger, account_name, client_cert_pem, client_key_pem), temps
 
     return None, temps
 
@@ -277,6 +1043,282 @@ def cleanup_temp_files(logger: logging.Logger, paths: Iterable[str]) -> None:
             logger.warning("Failed to delete temp file %s: %s", p, ex)
 
 
+# Connection pools per session: one pool per host, enough connections for
+# concurrent inputs/shards hitting the same org. pool_block makes extra
+# threads wait for a free connection instead of opening throwaway ones.
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 32
+
+_HTTP_SESSIONS: Dict[Tuple[Any, ...], requests.Session] = {}
+_HTTP_SESSIONS_LOCK = threading.Lock()
+
+
+def _cert_fingerprint(cert: Optional[Tuple[str, str]]) -> str:
+    """Hash the client cert/key contents so rotated credentials get a new session."""
+    if not cert:
+        return ""
+    cached = _CERT_DIGESTS.get(cert[0])
+    if cached:
+        return cached
+    digest = hashlib.sha256()
+    for path in cert:
+        try:
+            with open(path, "rb") as fh:
+                digest.update(fh.read())
+        except OSError:
+            digest.update(str(path).encode("utf-8"))
+    return digest.hexdigest()
+
+
+_HTTP_CLASSES: Optional[Tuple[type, type]] = None
+_HTTP_CLASSES_LOCK = threading.Lock()
+
+
+def _http_classes() -> Tuple[type, type]:
+    """Return (_ClientCertAdapter, _PooledSession); defined on first use so importing utils skips requests."""
+    global _HTTP_CLASSES
+    with _HTTP_CLASSES_LOCK:
+        if _HTTP_CLASSES is not None:
+            return _HTTP_CLASSES
+
+        class _ClientCertAdapter(requests.adapters.HTTPAdapter):
+            """HTTPAdapter whose connection pools use a prebuilt SSLContext holding the client cert."""
+
+            def __init__(self, ssl_context: ssl.SSLContext, **kwargs: Any):
+                self._ssl_context = ssl_context
+                super().__init__(**kwargs)
+
+            def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+                kwargs["ssl_context"] = self._ssl_context
+                super().init_poolmanager(*args, **kwargs)
+
+            def proxy_manager_for(self, proxy: str, **proxy_kwargs: Any) -> Any:
+                proxy_kwargs["ssl_context"] = self._ssl_context
+                return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+        class _PooledSession(requests.Session):
+            #: True when the client cert is carried by the adapter's SSLContext, so
+            #: requests must not pass ``cert=`` (which would reload it per connection).
+            cert_in_context = False
+
+        _HTTP_CLASSES = (_ClientCertAdapter, _PooledSession)
+        return _HTTP_CLASSES
+
+
+def _new_http_session(ssl_context: Optional[ssl.SSLContext] = None) -> requests.Session:
+    client_cert_adapter, pooled_session = _http_classes()
+    session = pooled_session()
+    pool_kwargs = dict(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        pool_block=True,
+    )
+    if ssl_context is not None:
+        adapter = client_cert_adapter(ssl_context, **pool_kwargs)
+        session.cert_in_context = True
+    else:
+        adapter = requests.adapters.HTTPAdapter(**pool_kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Sessions are shared by input threads; refusing cookies keeps the jar
+    # read-only so concurrent requests never mutate shared session state.
+    session.cookies.set_policy(cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_http_session(
+    url: str,
+    proxies: Optional[Dict[str, str]],
+    cert: Optional[Tuple[str, str]],
+    verify_ssl: bool,
+) -> requests.Session:
+    """Return the shared keep-alive session for (base URL, proxy, client cert, verify)."""
+    parts = urlsplit(url)
+    key = (
+        f"{parts.scheme}://{parts.netloc}".lower(),
+        tuple(sorted((proxies or {}).items())),
+        _cert_fingerprint(cert),
+        bool(verify_ssl),
+    )
+    with _HTTP_SESSIONS_LOCK:
+        session = _HTTP_SESSIONS.get(key)
+    if session is not None:
+        return session
+
+    ssl_context = None
+    if cert and parts.scheme.lower() == "https":
+        try:
+            ssl_context = get_client_ssl_context(cert, verify_ssl)
+        except (OSError, ssl.SSLError) as ex:
+            _utils_logger().warning("Could not preload client certificate into an SSL context: %s", ex)
+
+    with _HTTP_SESSIONS_LOCK:
+        session = _HTTP_SESSIONS.get(key)
+        if session is None:
+            session = _HTTP_SESSIONS[key] = _new_http_session(ssl_context)
+    return session
+
+
+def _drop_http_sessions(predicate: Any) -> None:
+    with _HTTP_SESSIONS_LOCK:
+        keys = [k for k in _HTTP_SESSIONS if predicate(k)]
+        sessions = [_HTTP_SESSIONS.pop(k) for k in keys]
+    for session in sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+
+def close_http_sessions() -> None:
+    """Close and forget every pooled session."""
+    with _HTTP_SESSIONS_LOCK:
+        sessions = list(_HTTP_SESSIONS.values())
+        _HTTP_SESSIONS.clear()
+    for session in sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+
+atexit.register(close_http_sessions)
+
+
+# Requests to one Apigee host/org share a token bucket whose rate adapts
+# (AIMD): it creeps up while responses are quick and is halved on 429/503.
+RATE_LIMIT_INITIAL_RPS = 5.0
+RATE_LIMIT_MIN_RPS = 0.2
+RATE_LIMIT_MAX_RPS = 50.0
+RATE_LIMIT_SLOW_RESPONSE_SEC = 10.0
+RETRY_BACKOFF_MAX_SEC = 120.0
+_THROTTLE_STATUS = frozenset((429, 503))
+_RETRY_STATUS = frozenset((408, 429, 500, 502, 503, 504))
+_ORG_IN_PATH = re.compile(r"/organizations/([^/]+)")
+
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by every caller of one Apigee host/org; backs off on throttling."""
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_INITIAL_RPS,
+        min_rate: float = RATE_LIMIT_MIN_RPS,
+        max_rate: float = RATE_LIMIT_MAX_RPS,
+        slow_response_sec: float = RATE_LIMIT_SLOW_RESPONSE_SEC,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.slow_response_sec = slow_response_sec
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self.throttled = 0
+
+    def _refill_locked(self, now: float) -> None:
+        burst = max(1.0, self.rate)
+        self._tokens = min(burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self) -> float:
+        """Take one token, sleeping as needed; return the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self._refill_locked(now)
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return waited
+                    delay = (1.0 - self._tokens) / self.rate
+                else:
+                    delay = self._paused_until - now
+            time.sleep(delay)
+            waited += delay
+
+    def on_success(self, elapsed_sec: float) -> None:
+        with self._lock:
+            if elapsed_sec >= self.slow_response_sec:
+                self._decrease_locked(time.monotonic(), 0.8)
+            else:
+                step = 1.0 if self._slow_start else 1.0 / self.rate
+                self.rate = min(self.max_rate, self.rate + step)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self._slow_start = False
+            self._decrease_locked(now, 0.5)
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+                self._tokens = 0.0
+                self._stamp = self._paused_until
+
+    def _decrease_locked(self, now: float, factor: float) -> None:
+        # Concurrent callers see the same overload; count it once per window.
+        if now - self._last_decrease < 1.0 / self.rate:
+            return
+        self._last_decrease = now
+        self._slow_start = False
+        self.rate = max(self.min_rate, self.rate * factor)
+
+
+_RATE_LIMITERS: Dict[Tuple[str, str], AdaptiveRateLimiter] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(url: str, max_rate: Optional[float] = None) -> AdaptiveRateLimiter:
+    """Return the process-wide limiter for the host and org of ``url``.
+
+    ``max_rate`` (requests/sec), when given, caps the limiter for every input
+    sharing it.
+    """
+    parts = urlsplit(url)
+    org = _ORG_IN_PATH.search(parts.path)
+    key = (parts.netloc.lower(), org.group(1) if org else "")
+    with _RATE_LIMITERS_LOCK:
+        limiter = _RATE_LIMITERS.get(key)
+        if limiter is None:
+            limiter = _RATE_LIMITERS[key] = AdaptiveRateLimiter()
+        if max_rate:
+            with limiter._lock:
+                limiter.max_rate = max(float(max_rate), limiter.min_rate)
+                limiter.rate = min(limiter.rate, limiter.max_rate)
+    return limiter
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email_utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _retry_delay(attempt: int, backoff_sec: float, retry_after: Optional[float]) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's ``Retry-After``."""
+    delay = random.uniform(0, min(RETRY_BACKOFF_MAX_SEC, backoff_sec * (2 ** (attempt - 1))))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, RETRY_BACKOFF_MAX_SEC)) + random.uniform(0, backoff_sec / 2)
+    return delay
+
+
 def http_get_with_retry(
     logger: logging.Logger,
     url: str,
@@ -289,11 +1331,29 @@ def http_get_with_retry(
     max_retries: int = 3,
     backoff_sec: float = 2.0,
     timeout: int = 60,
+    session: Optional[requests.Session] = None,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+    metrics: Optional[PhaseMetrics] = None,
 ) -> requests.Response:
+    """GET through a pooled keep-alive session with rate limiting and jittered, retried backoff.
+
+    ``limiter`` caps the request rate on top of the shared host/org limiter, which always applies.
+    """
+    session = session or get_http_session(url, proxies, cert, verify_ssl)
+    limiters = [get_rate_limiter(url)]
+    if limiter is not None and limiter is not limiters[0]:
+        limiters.insert(0, limiter)  # wait on the cap before taking a shared token
+    if getattr(session, "cert_in_context", False):
+        cert = None
     last_exc: Optional[Exception] = None
+    metrics = metrics or PhaseMetrics()
     for attempt in range(1, max_retries + 1):
+        metrics.add_time("rate_limit_wait", sum(lim.acquire() for lim in limiters))
+        metrics.count("http_requests")
+        retry_after: Optional[float] = None
+        started = time.monotonic()
         try:
-            resp = requests.get(
+            resp = session.get(
                 url=url,
                 params=params,
                 headers=headers,
@@ -303,13 +1363,34 @@ def http_get_with_retry(
                 verify=verify_ssl,
                 timeout=timeout,
             )
+            metrics.add_time("http", time.monotonic() - started)
+            metrics.count("bytes_received", len(resp.content))
+            if resp.status_code in _THROTTLE_STATUS:
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                for lim in limiters:
+                    lim.on_throttle(retry_after)
+            elif resp.status_code < 400:
+                elapsed = time.monotonic() - started
+                for lim in limiters:
+                    lim.on_success(elapsed)
             resp.raise_for_status()
             return resp
+        except requests.exceptions.HTTPError as ex:
+            last_exc = ex
+            status = ex.response.status_code if ex.response is not None else None
+            if status not in _RETRY_STATUS:
+                raise
+            logger.warning("HTTP GET failed (attempt %s/%s): %s", attempt, max_retries, ex)
         except requests.exceptions.RequestException as ex:
+            metrics.add_time("http", time.monotonic() - started)
             last_exc = ex
             logger.warning("HTTP GET failed (attempt %s/%s): %s", attempt, max_retries, ex)
-            if attempt < max_retries:
-                time.sleep(backoff_sec * attempt)
+        if attempt < max_retries:
+            delay = _retry_delay(attempt, backoff_sec, retry_after)
+            logger.info("Retrying in %.1fs (rate limit now %.2f req/s)", delay, min(lim.rate for lim in limiters))
+            metrics.count("http_retries")
+            metrics.add_time("http_backoff", delay)
+            time.sleep(delay)
     if last_exc:
         raise last_exc
     raise RuntimeError("HTTP GET failed with unknown error")
@@ -325,6 +1406,175 @@ def get_checkpoint_manager(session_key: str) -> checkpointer.CheckpointerInterfa
     )
 
 
+CHECKPOINT_FLUSH_INTERVAL_SEC = 5.0
+CHECKPOINT_FLUSH_MAX_PENDING = 50
+_KV_PAGE_SIZE = 1000  # KV Store batch_save caps a single request at 1000 documents
+
+
+def _kv_query_states(collection: Any, query: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Read ``{_key: decoded state}`` for every checkpointer document matching ``query``, in pages."""
+    params = {"query": json.dumps(query)} if query else {}
+    loaded: Dict[str, Any] = {}
+    skip = 0
+    while True:
+        docs = collection.query(limit=_KV_PAGE_SIZE, skip=skip, **params)
+        for doc in docs:
+            try:
+                loaded[doc["_key"]] = json.loads(doc["state"])
+            except (KeyError, TypeError, ValueError):
+                continue
+        if len(docs) < _KV_PAGE_SIZE:
+            return loaded
+        skip += len(docs)
+
+
+class CheckpointStore:
+    """Write-behind cache in front of a KV Store checkpointer, with the same ``get``/``update`` calls."""
+
+    def __init__(
+        self,
+        ckpt_mgr: checkpointer.CheckpointerInterface,
+        logger: logging.Logger,
+        flush_interval_sec: float = CHECKPOINT_FLUSH_INTERVAL_SEC,
+        max_pending: int = CHECKPOINT_FLUSH_MAX_PENDING,
+    ):
+        self._ckpt = ckpt_mgr
+        self._logger = logger
+        self.flush_interval_sec = flush_interval_sec
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._states: Dict[str, Any] = {}
+        self._dirty: Dict[str, Any] = {}
+        self._preloaded = False
+        self._closed = False
+        self._fence: Optional[Callable[[str], bool]] = None
+        self._last_flush = time.monotonic()
+
+    def preload(self) -> int:
+        """Load every stored checkpoint in bulk; returns how many were read."""
+        collection = getattr(self._ckpt, "_collection_data", None)
+        if collection is None:
+            return 0
+        try:
+            loaded = _kv_query_states(collection)
+        except Exception as ex:
+            self._logger.warning("Checkpoint preload failed; falling back to per-input reads: %s", ex)
+            return 0
+        with self._lock:
+            for key, state in loaded.items():
+                self._states.setdefault(key, state)
+            self._preloaded = True
+        self._logger.info("Preloaded %d checkpoints from KV Store", len(loaded))
+        return len(loaded)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._states or self._preloaded:
+                return self._states.get(key)
+        state = self._ckpt.get(key)
+        with self._lock:
+            return self._states.setdefault(key, state)
+
+    def set_fence(self, fence: Optional[Callable[[str], bool]]) -> None:
+        """Refuse updates, and drop pending states, of keys ``fence`` returns False for."""
+        self._fence = fence
+
+    def update(self, key: str, state: Any) -> None:
+        if self._fence is not None and not self._fence(key):
+            raise RuntimeError(f"checkpoint {key!r} belongs to a shard this node no longer holds; update not saved")
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"checkpoint store is closed; update of {key!r} not saved")
+            self._states[key] = state
+            self._dirty[key] = state
+            due = (
+                len(self._dirty) >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.flush_interval_sec
+            )
+        if due:
+            self.flush()
+
+    def refresh(self, key: str) -> Optional[Any]:
+        """Re-read ``key`` from KV Store, discarding any unflushed local state."""
+        state = self._ckpt.get(key)
+        with self._lock:
+            self._dirty.pop(key, None)
+            self._states[key] = state
+        return state
+
+    def reload(self, *names: str) -> int:
+        """Re-read each checkpoint in ``names`` and its ``name:*`` keys from KV Store in one query.
+
+        Unflushed local state for those keys is dropped. Returns how many keys
+        were read; KV Store errors are raised.
+        """
+        if not names:
+            return 0
+        pattern = re.compile("^(%s)(:|$)" % "|".join(re.escape(name) for name in names))
+        collection = getattr(self._ckpt, "_collection_data", None)
+        if collection is None:
+            with self._lock:
+                keys = [key for key in self._states if pattern.match(key)]
+            for key in set(keys) | set(names):
+                self.refresh(key)
+            return len(set(keys) | set(names))
+        loaded = {
+            key: state
+            for key, state in _kv_query_states(collection, {"_key": {"$regex": pattern.pattern}}).items()
+            if pattern.match(key)
+        }
+        with self._lock:
+            for key in [key for key in self._states if pattern.match(key)]:
+                del self._states[key]
+            for key in [key for key in self._dirty if pattern.match(key)]:
+                del self._dirty[key]
+            self._states.update(loaded)
+            for name in names:
+                self._states.setdefault(name, None)
+        return len(loaded)
+
+    def flush(self) -> None:
+        """Write every pending state; failures are logged and kept for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, {}
+                self._last_flush = time.monotonic()
+            if self._fence is not None:
+                fenced = [key for key in pending if not self._fence(key)]
+                for key in fenced:
+                    del pending[key]
+                if fenced:
+                    self._logger.warning("Dropped %d checkpoints of shards this node no longer holds", len(fenced))
+            if not pending:
+                return
+            items = list(pending.items())
+            for start in range(0, len(items), _KV_PAGE_SIZE):
+                chunk = items[start:start + _KV_PAGE_SIZE]
+                try:
+                    self._ckpt.batch_update([{"_key": key, "state": state} for key, state in chunk])
+                except Exception as ex:
+                    self._logger.error("Failed to flush %d checkpoints: %s", len(chunk), ex)
+                    with self._lock:
+                        for key, state in chunk:
+                            self._dirty.setdefault(key, state)
+            self._logger.debug("Flushed %d checkpoints", len(items))
+
+    def close(self) -> None:
+        """Flush and refuse further updates, so a late writer fails instead of being dropped."""
+        with self._lock:
+            self._closed = True
+        self.flush()
+
+
+def get_checkpoint_store(session_key: str, logger: logging.Logger, preload: bool = True) -> CheckpointStore:
+    """Create a write-behind checkpoint store over the add-on's KV collection."""
+    store = CheckpointStore(get_checkpoint_manager(session_key), logger)
+    if preload:
+        store.preload()
+    return store
+
+
 def get_last_checkpoint_time(
     ckpt_mgr: checkpointer.CheckpointerInterface,
     key: str,
@@ -347,17 +1597,33 @@ def get_last_checkpoint_time(
     return default_start_time
 
 
+def get_checkpoint_state(
+    ckpt_mgr: checkpointer.CheckpointerInterface,
+    key: str,
+    logger: logging.Logger,
+) -> Dict[str, Any]:
+    """Return the stored checkpoint document for ``key`` (empty dict if none)."""
+    try:
+        data = ckpt_mgr.get(key)
+        return dict(data) if isinstance(data, dict) else {}
+    except Exception as ex:
+        logger.warning("Failed to read checkpoint: %s", ex)
+        return {}
+
+
 def update_checkpoint(
     ckpt_mgr: checkpointer.CheckpointerInterface,
     key: str,
     last_event_time: int,
     events_processed: int,
     logger: logging.Logger,
+    extra: Optional[Dict[str, Any]] = None,
 ) -> None:
     try:
         ckpt_mgr.update(
             key,
             {
+                **(extra or {}),
                 "last_event_time": int(last_event_time),
                 "events_processed": int(events_processed),
                 "last_updated": now_ms(),
@@ -369,9 +1635,1083 @@ def update_checkpoint(
         logger.error("Failed to update checkpoint: %s", ex)
 
 
+# ------------------------- Lease coordination -------------------------
+
+LEASE_TTL_SEC = 900
+_LEASE_PREFIX = "__lease__:"
+_NODE_PREFIX = "__node__:"
+
+
+def _shard_weight(node_id: str, shard: str) -> bytes:
+    return hashlib.sha1(f"{node_id}\x00{shard}".encode("utf-8")).digest()
+
+
+class LeaseCoordinator:
+    """Split shards of inputs between the nodes sharing the checkpoint collection.
+
+    Shards are assigned by rendezvous hashing over live nodes; a node runs a shard only while it holds its lease.
+    A lease is the ``__lease__:<shard>@<epoch>`` document with the highest epoch, claimed by a KV Store insert.
+    """
+
+    def __init__(
+        self,
+        store: CheckpointStore,
+        logger: logging.Logger,
+        node_id: Optional[str] = None,
+        ttl_sec: float = LEASE_TTL_SEC,
+    ):
+        self._ckpt = store._ckpt  # leases bypass the write-behind cache
+        self._collection = getattr(self._ckpt, "_collection_data", None)
+        if self._collection is None:
+            raise ValueError("Lease coordination needs the KV Store checkpointer")
+        self._store = store
+        self._logger = logger
+        self.node_id = node_id or socket.gethostname()
+        self.ttl_ms = int(ttl_sec * 1000)
+        # A lease this close to lapsing may be claimed by another node at any moment: stop writing, don't renew.
+        self._margin_ms = self.ttl_ms // 3
+        self._lock = threading.Lock()
+        self._held: Dict[str, List[str]] = {}  # shard -> checkpoint names of its inputs
+        self._epochs: Dict[str, int] = {}  # shard -> epoch of the lease this node holds
+        self._expires: Dict[str, int] = {}  # shard -> when that lease lapses unless renewed
+        self._shard_of: Dict[str, str] = {}  # checkpoint name -> shard, for every configured shard
+        self._draining: Set[str] = set()
+        self._runs: Dict[str, int] = {}  # shard -> inputs of it running now
+        self._stop = threading.Event()
+        self._renewer: Optional[threading.Thread] = None
+        store.set_fence(self.may_write)
+
+    def held(self) -> Set[str]:
+        """Shards this node holds and may run."""
+        with self._lock:
+            return set(self._held) - self._draining
+
+    def may_write(self, key: str) -> bool:
+        """False for checkpoint keys of a configured shard this node does not hold, or whose lease may have lapsed."""
+        parts = key.split(":")
+        now = now_ms()
+        with self._lock:
+            for end in range(len(parts), 0, -1):
+                shard = self._shard_of.get(":".join(parts[:end]))
+                if shard is not None:
+                    return shard in self._held and self._expires.get(shard, 0) - self._margin_ms > now
+        return True
+
+    def rebalance(self, shards: Dict[str, List[str]]) -> Set[str]:
+        """Heartbeat, hand off shards that now belong elsewhere and claim this node's; returns ``held()``.
+
+        ``shards`` maps every configured shard to the checkpoint names of its
+        inputs. KV Store errors are logged and leave the held shards as they are.
+        """
+        try:
+            now = now_ms()
+            node_docs, leases, _ = self._read()
+            self._heartbeat(now)
+            nodes = {self.node_id}
+            for node, state in node_docs.items():
+                expires = int(state.get("expires") or 0) if isinstance(state, dict) else 0
+                if expires > now:
+                    nodes.add(node)
+                elif expires < now - self.ttl_ms:
+                    self._ckpt.delete(_NODE_PREFIX + node)  # long gone; forget it
+            self._renew(now, leases)
+            # Leases this node took in an earlier process count as held too.
+            mine = {shard for shard, lease in leases.items() if lease.get("owner") == self.node_id}
+            won = []
+            claimed = []
+            with self._lock:
+                self._shard_of = {name: shard for shard, names in shards.items() for name in names}
+                held = dict(self._held)
+                self._held.update((shard, names) for shard, names in shards.items() if shard in held)
+            for shard in sorted(set(held) | set(shards) | mine):
+                target = max(sorted(nodes), key=lambda node: _shard_weight(node, shard))
+                lease = leases.get(shard) or {}
+                live = int(lease.get("expires") or 0) > now
+                if shard not in shards or target != self.node_id:
+                    if shard in held:
+                        self._release(shard)
+                    elif shard in mine and live:
+                        self._expire(shard, int(lease["epoch"]))
+                    continue
+                if shard in held:
+                    with self._lock:
+                        self._draining.discard(shard)
+                    continue
+                if shard in mine and live:
+                    # Still ours from the previous run: nobody else can have claimed it, so keep going.
+                    self._write_lease(shard, int(lease["epoch"]), now)
+                    won.append((shard, int(lease["epoch"])))
+                elif not live:
+                    epoch = int(lease.get("epoch") or 0) + 1
+                    if self._insert_lease(shard, epoch, now):
+                        claimed.append((shard, epoch))
+                    else:
+                        self._logger.info("Lease on shard %s went to another node", shard)
+                # else: still held elsewhere; its owner hands it off or the lease lapses
+            if claimed:
+                # An insert made from a stale read can land below a newer epoch; only the newest lease counts.
+                _, leases, stale = self._read()
+                for shard, epoch in claimed:
+                    if leases.get(shard, {}).get("epoch") != epoch:
+                        self._logger.info("Lease on shard %s went to another node", shard)
+                        continue
+                    for key in stale.get(shard, []):
+                        self._ckpt.delete(key)
+                    won.append((shard, epoch))
+            if won:
+                self._store.reload(*(name for shard, _ in won for name in shards[shard]))
+                with self._lock:
+                    for shard, epoch in won:
+                        self._held[shard] = list(shards[shard])
+                        self._epochs[shard] = epoch
+                        self._expires[shard] = now + self.ttl_ms
+                self._logger.info("Acquired leases on shards %s", [shard for shard, _ in won])
+            self._logger.info(
+                "Node %s holds %d of %d shards (%d live nodes)", self.node_id, len(self.held()), len(shards), len(nodes)
+            )
+        except Exception as ex:
+            self._logger.warning("Lease rebalance failed; keeping the current shards: %s", ex)
+        return self.held()
+
+    @contextmanager
+    def running(self, shard: str) -> Iterator[bool]:
+        """Mark one input of ``shard`` as running; yields False if this node may not run it."""
+        with self._lock:
+            owned = shard in self._held and shard not in self._draining
+            if owned:
+                self._runs[shard] = self._runs.get(shard, 0) + 1
+            draining = shard in self._draining
+        if not owned:
+            if draining:
+                self._logger.info("Shard %s is being handed off to another node; not starting it", shard)
+            else:
+                self._logger.info("Shard %s is not held by this node; not starting it", shard)
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            with self._lock:
+                self._runs[shard] -= 1
+
+    def start(self) -> None:
+        """Renew the heartbeat and held leases every third of the TTL on a daemon thread."""
+        if self._renewer is not None:
+            return
+
+        def _loop() -> None:
+            while not self._stop.wait(self.ttl_ms / 3000.0):
+                try:
+                    now = now_ms()
+                    self._heartbeat(now)
+                    self._renew(now, self._read()[1])
+                except Exception as ex:
+                    self._logger.warning("Lease renewal failed: %s", ex)
+
+        self._renewer = threading.Thread(target=_loop, name="apigee_lease", daemon=True)
+        self._renewer.start()
+
+    def close(self, release: bool = False) -> None:
+        """Stop renewing; with ``release`` hand back every idle shard and leave the node set."""
+        self._stop.set()
+        if not release:
+            return
+        try:
+            with self._lock:
+                shards = sorted(self._held)
+            for shard in shards:
+                self._release(shard)
+            self._ckpt.delete(_NODE_PREFIX + self.node_id)
+        except Exception as ex:
+            self._logger.warning(
+                "Could not release leases on exit; they lapse after %.0fs: %s", self.ttl_ms / 1000.0, ex
+            )
+
+    def _read(self) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]], Dict[str, List[str]]]:
+        """Node heartbeats, the newest lease of each shard and the keys of older ones, from one KV Store query."""
+        states = _kv_query_states(self._collection, {"_key": {"$regex": "^__(node|lease)__:"}})
+        nodes: Dict[str, Any] = {}
+        leases: Dict[str, Dict[str, Any]] = {}
+        stale: Dict[str, List[str]] = {}
+        for key, state in states.items():
+            if key.startswith(_NODE_PREFIX):
+                nodes[key[len(_NODE_PREFIX):]] = state
+                continue
+            shard, _, epoch = key[len(_LEASE_PREFIX):].rpartition("@")
+            if not key.startswith(_LEASE_PREFIX) or not shard or not epoch.isdigit() or not isinstance(state, dict):
+                continue
+            newest = leases.get(shard)
+            if newest is not None and newest["epoch"] > int(epoch):
+                stale.setdefault(shard, []).append(key)
+                continue
+            if newest is not None:
+                stale.setdefault(shard, []).append(_lease_key(shard, newest["epoch"]))
+            leases[shard] = dict(state, epoch=int(epoch))
+        return nodes, leases, stale
+
+    def _heartbeat(self, now: int) -> None:
+        self._ckpt.update(_NODE_PREFIX + self.node_id, {"node": self.node_id, "expires": now + self.ttl_ms})
+
+    def _insert_lease(self, shard: str, epoch: int, now: int) -> bool:
+        """Claim ``shard`` at ``epoch``; False when another node inserted that epoch first (HTTP 409)."""
+        state = {"owner": self.node_id, "expires": now + self.ttl_ms}
+        try:
+            self._collection.insert(json.dumps({"_key": _lease_key(shard, epoch), "state": json.dumps(state)}))
+        except Exception as ex:
+            if getattr(ex, "status", None) == 409:
+                return False
+            raise
+        return True
+
+    def _write_lease(self, shard: str, epoch: int, now: int) -> None:
+        self._ckpt.update(_lease_key(shard, epoch), {"owner": self.node_id, "expires": now + self.ttl_ms})
+
+    def _expire(self, shard: str, epoch: int) -> None:
+        # Expired in place rather than deleted, so the next claim still moves to a higher epoch.
+        self._ckpt.update(_lease_key(shard, epoch), {"owner": self.node_id, "expires": 0})
+
+    def _renew(self, now: int, leases: Dict[str, Dict[str, Any]]) -> None:
+        """Extend the held leases in KV Store and ``leases``; a lease claimed elsewhere or about to lapse is dropped."""
+        with self._lock:
+            held = {shard: (names, self._epochs[shard]) for shard, names in self._held.items()}
+        lost: List[str] = []
+        for shard, (names, epoch) in held.items():
+            lease = leases.get(shard) or {}
+            if lease.get("owner") != self.node_id or lease.get("epoch") != epoch:
+                self._logger.warning("Lease on shard %s was taken by node %s; dropping it", shard, lease.get("owner"))
+            elif int(lease.get("expires") or 0) - self._margin_ms <= now:
+                self._logger.warning("Lease on shard %s was not renewed in time; dropping it", shard)
+            else:
+                self._write_lease(shard, epoch, now)
+                with self._lock:
+                    self._expires[shard] = now + self.ttl_ms
+                leases[shard] = {"owner": self.node_id, "expires": now + self.ttl_ms, "epoch": epoch}
+                continue
+            with self._lock:
+                self._held.pop(shard, None)
+                self._epochs.pop(shard, None)
+                self._expires.pop(shard, None)
+                self._draining.discard(shard)
+            lost.extend(names)
+        if lost:
+            self._store.reload(*lost)  # discard progress the new owner will redo
+
+    def _release(self, shard: str) -> None:
+        with self._lock:
+            self._draining.add(shard)
+            if self._runs.get(shard):
+                self._logger.info("Shard %s is still running; releasing it after the run", shard)
+                return
+            epoch = self._epochs.get(shard)
+        self._store.flush()
+        if epoch is not None:
+            self._expire(shard, epoch)
+        with self._lock:
+            self._held.pop(shard, None)
+            self._epochs.pop(shard, None)
+            self._expires.pop(shard, None)
+            self._draining.discard(shard)
+        self._logger.info("Released lease on shard %s", shard)
+
+
+def _lease_key(shard: str, epoch: int) -> str:
+    return f"{_LEASE_PREFIX}{shard}@{epoch}"
+
+
+# ------------------------- Event output -------------------------
+
+EVENT_BATCH_SIZE = 500
+
+
+def make_json_encoder(name: str = "json") -> Callable[[Any], str]:
+    """Return a record -> JSON text encoder (``json`` or ``orjson``, which falls back to ``json``)."""
+    encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+    if str(name).strip().lower() != "orjson" or orjson is None:
+        return encode
+
+    def _orjson_encode(obj: Any) -> str:
+        try:
+            return orjson.dumps(obj, default=str).decode("utf-8")
+        except TypeError:
+            return encode(obj)
+
+    return _orjson_encode
+
+
+def _xml_text(value: str) -> str:
+    # Same escaping ElementTree applies to element text in smi.Event.write_to,
+    # including character references for non-ASCII (it serializes as us-ascii).
+    value = value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    if not value.isascii():
+        value = value.encode("ascii", "xmlcharrefreplace").decode("ascii")
+    return value
+
+
+def write_raw_events(event_writer: Any, chunk: str) -> None:
+    """Append pre-rendered ``<event>`` XML to an EventWriter's stream and flush once."""
+    if isinstance(event_writer, SerializedEventWriter):
+        event_writer.write_raw(chunk)
+        return
+    out = event_writer._out
+    if not event_writer.header_written:
+        out.write("<stream>")
+        event_writer.header_written = True
+    out.write(chunk)
+    out.flush()
+
+
+class BatchEventWriter:
+    """Render events straight to modular-input XML and write them in batches."""
+
+    def __init__(
+        self,
+        event_writer: Any,
+        index: Optional[str],
+        sourcetype: Optional[str],
+        source: Optional[str],
+        batch_size: int = EVENT_BATCH_SIZE,
+    ):
+        self._writer = event_writer
+        self.batch_size = batch_size
+        tail = "".join(
+            f"<{tag}>{_xml_text(value)}</{tag}>"
+            for tag, value in (("sourcetype", sourcetype), ("index", index))
+            if value is not None
+        )
+        self._timed_tail = (f"<source>{_xml_text(source)}</source>" if source is not None else "") + tail + "<data>"
+        self._untimed_head = '<event unbroken="1">' + tail + "<data>"
+        self._buf: List[str] = []
+        self.chars_written = 0
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    @property
+    def full(self) -> bool:
+        return len(self._buf) >= self.batch_size
+
+    def add(self, data: str, time_sec: Optional[int]) -> None:
+        """Queue one event; ``time_sec=None`` omits <time> and <source>, like untimed events today."""
+        if time_sec is None:
+            self._buf.append(f"{self._untimed_head}{_xml_text(data)}</data><done /></event>")
+        else:
+            self._buf.append(
+                f'<event unbroken="1"><time>{time_sec}</time>{self._timed_tail}{_xml_text(data)}</data><done /></event>'
+            )
+
+    def flush(self, on_commit: Optional[Callable[[int], None]] = None) -> int:
+        """Write queued events in one chunk; returns how many were written.
+
+        ``on_commit`` is called with that count once the chunk is written.
+        """
+        if not self._buf:
+            return 0
+        chunk, count = "".join(self._buf), len(self._buf)
+        self._buf = []
+        write_raw_events(self._writer, chunk)
+        self.chars_written += len(chunk)
+        if on_commit is not None:
+            on_commit(count)
+        return count
+
+    def close(self) -> None:
+        """Nothing is held back; present for parity with ``HecEventWriter``."""
+
+
+# ------------------------- HEC output -------------------------
+
+HEC_SENDERS = 4
+HEC_BATCH_EVENTS = 5000
+HEC_BATCH_KB = 2048  # uncompressed
+HEC_MAX_RETRIES = 5
+HEC_ACK_TIMEOUT_SEC = 120.0
+HEC_ACK_POLL_SEC = 1.0  # longest pause between ack polls; the first comes after 50 ms
+HEC_GZIP_LEVEL = 6
+_HEC_EVENT_PATH = "/services/collector/event"
+_HEC_ACK_PATH = "/services/collector/ack"
+_json_string = json.encoder.encode_basestring  # C-accelerated JSON string literal, keeps non-ASCII
+
+
+class HecError(Exception):
+    """A batch that HTTP Event Collector did not accept or acknowledge."""
+
+
+class HecSink:
+    """An HTTP Event Collector endpoint shared by every input of the process."""
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        verify_ssl: bool = True,
+        senders: int = HEC_SENDERS,
+        ack_timeout_sec: float = HEC_ACK_TIMEOUT_SEC,
+        max_retries: int = HEC_MAX_RETRIES,
+        backoff_sec: float = 1.0,
+    ):
+        base = url.rstrip("/")
+        if base.endswith(_HEC_EVENT_PATH):
+            base = base[: -len(_HEC_EVENT_PATH)]
+        self.event_url = base + _HEC_EVENT_PATH
+        self.ack_url = base + _HEC_ACK_PATH
+        self.verify_ssl = verify_ssl
+        self.senders = max(1, senders)
+        self.ack_timeout_sec = ack_timeout_sec
+        self.max_retries = max(1, max_retries)
+        self.backoff_sec = backoff_sec
+        self.channel = str(uuid.uuid4())
+        self._headers = {
+            "Authorization": f"Splunk {token}",
+            "Content-Encoding": "gzip",
+            "Content-Type": "application/json",
+            "X-Splunk-Request-Channel": self.channel,
+        }
+        self._pool = ThreadPoolExecutor(max_workers=self.senders, thread_name_prefix="apigee_hec")
+
+    def submit(self, body: str, metrics: Optional[PhaseMetrics] = None) -> Any:
+        """Queue one batch of newline-separated HEC events; returns its future."""
+        return self._pool.submit(self._send, body, metrics or PhaseMetrics())
+
+    def _send(self, body: str, metrics: PhaseMetrics) -> None:
+        payload = gzip.compress(body.encode("utf-8"), compresslevel=HEC_GZIP_LEVEL)
+        session = get_http_session(self.event_url, None, None, self.verify_ssl)
+        last_error = ""
+        for attempt in range(1, self.max_retries + 1):
+            retry_after: Optional[float] = None
+            try:
+                started = time.monotonic()
+                resp = session.post(
+                    self.event_url, data=payload, headers=self._headers, timeout=60, verify=self.verify_ssl
+                )
+                metrics.add_time("hec_post", time.monotonic() - started)
+                metrics.count("hec_requests")
+                if resp.status_code == 200:
+                    metrics.count("hec_bytes_sent", len(payload))
+                    ack_id = _hec_ack_id(resp)
+                    if ack_id is None or self._wait_ack(session, ack_id, metrics):
+                        return
+                    last_error = f"ackId {ack_id} not acknowledged within {self.ack_timeout_sec:.0f}s"
+                elif resp.status_code in _RETRY_STATUS:
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                    last_error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+                else:
+                    raise HecError(f"HEC refused the batch: HTTP {resp.status_code}: {resp.text[:200]}")
+            except requests.exceptions.RequestException as ex:
+                last_error = str(ex)
+            metrics.count("hec_retries")
+            if attempt < self.max_retries:
+                time.sleep(_retry_delay(attempt, self.backoff_sec, retry_after))
+        raise HecError(f"HEC batch failed after {self.max_retries} attempts: {last_error}")
+
+    def _wait_ack(self, session: Any, ack_id: int, metrics: PhaseMetrics) -> bool:
+        started = time.monotonic()
+        deadline = started + self.ack_timeout_sec
+        body = json.dumps({"acks": [ack_id]})
+        headers = {k: v for k, v in self._headers.items() if k != "Content-Encoding"}
+        pause = 0.05
+        try:
+            while True:
+                time.sleep(pause)
+                pause = min(pause * 2, HEC_ACK_POLL_SEC)
+                try:
+                    resp = session.post(self.ack_url, data=body, headers=headers, timeout=30, verify=self.verify_ssl)
+                    if resp.status_code == 200 and resp.json().get("acks", {}).get(str(ack_id)):
+                        return True
+                except (requests.exceptions.RequestException, ValueError, AttributeError):
+                    pass
+                if time.monotonic() >= deadline:
+                    return False
+        finally:
+            metrics.add_time("hec_ack_wait", time.monotonic() - started)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+def _hec_ack_id(resp: Any) -> Optional[int]:
+    try:
+        ack_id = resp.json().get("ackId")
+    except (ValueError, AttributeError):
+        return None
+    return int(ack_id) if ack_id is not None else None
+
+
+_HEC_SINKS: Dict[Tuple[str, str, bool], HecSink] = {}
+_HEC_SINKS_LOCK = threading.Lock()
+
+
+def get_hec_sink(url: str, token: str, verify_ssl: bool = True, **kwargs: Any) -> HecSink:
+    """Return the process-wide sink for (url, token, verify_ssl), creating it with ``kwargs``."""
+    key = (url.rstrip("/"), token, bool(verify_ssl))
+    with _HEC_SINKS_LOCK:
+        sink = _HEC_SINKS.get(key)
+        if sink is None:
+            sink = _HEC_SINKS[key] = HecSink(url, token, verify_ssl=verify_ssl, **kwargs)
+    return sink
+
+
+class HecEventWriter:
+    """Drop-in for ``BatchEventWriter`` that sends batches to an ``HecSink``; commits follow acceptance in order."""
+
+    def __init__(
+        self,
+        sink: HecSink,
+        index: Optional[str],
+        sourcetype: Optional[str],
+        source: Optional[str],
+        batch_size: int = HEC_BATCH_EVENTS,
+        max_batch_kb: int = HEC_BATCH_KB,
+        metrics: Optional[PhaseMetrics] = None,
+    ):
+        self._sink = sink
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_kb * 1024
+        self._metrics = metrics or PhaseMetrics()
+        meta = "".join(
+            f',"{key}":{json.dumps(value, ensure_ascii=False)}'
+            for key, value in (("sourcetype", sourcetype), ("index", index))
+            if value is not None
+        )
+        # Untimed events carry no time or source, as with BatchEventWriter.
+        self._timed_meta = (f',"source":{json.dumps(source, ensure_ascii=False)}' if source is not None else "") + meta
+        self._untimed_head = '{"event":'
+        self._untimed_tail = meta + "}"
+        self._buf: List[str] = []
+        self._buf_chars = 0
+        self._in_flight: "deque[Tuple[Any, int, Optional[Callable[[int], None]]]]" = deque()
+        self._error: Optional[BaseException] = None
+        self.chars_written = 0
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    @property
+    def full(self) -> bool:
+        return len(self._buf) >= self.batch_size or self._buf_chars >= self.max_batch_chars
+
+    def add(self, data: str, time_sec: Optional[int]) -> None:
+        """Queue one event; ``time_sec=None`` omits time and source."""
+        if time_sec is None:
+            line = f"{self._untimed_head}{_json_string(data)}{self._untimed_tail}"
+        else:
+            line = f'{{"time":{time_sec}{self._timed_meta},"event":{_json_string(data)}}}'
+        self._buf.append(line)
+        self._buf_chars += len(line) + 1
+
+    def flush(self, on_commit: Optional[Callable[[int], None]] = None) -> int:
+        """Send queued events as one batch; returns how many were handed to the sink."""
+        self._commit_done(block=len(self._in_flight) >= self._sink.senders)
+        if self._error is not None:
+            raise HecError(f"an earlier HEC batch failed: {self._error}")
+        if not self._buf:
+            return 0
+        body, count = "\n".join(self._buf), len(self._buf)
+        self._buf, self._buf_chars = [], 0
+        self._in_flight.append((self._sink.submit(body, self._metrics), count, on_commit))
+        self.chars_written += len(body)
+        self._metrics.count("hec_batches")
+        return count
+
+    def close(self) -> None:
+        """Wait for every batch in flight and run its commit; raises ``HecError`` if one failed."""
+        while self._in_flight:
+            self._commit_done(block=True)
+        if self._error is not None:
+            raise HecError(str(self._error))
+
+    def _commit_done(self, block: bool) -> None:
+        while self._in_flight and (block or self._in_flight[0][0].done()):
+            block = False
+            future, count, on_commit = self._in_flight.popleft()
+            try:
+                future.result()
+            except Exception as ex:
+                if self._error is None:
+                    self._error = ex
+                continue
+            if self._error is None and on_commit is not None:
+                on_commit(count)
+
+
+# ------------------------- External sort -------------------------
+
+SORT_BUFFER_MB = 128
+_RUN_HEADER = struct.Struct("<qI")  # timestamp, payload length
+_BY_TS = itemgetter(0)
+
+
+class ExternalSorter:
+    """Sort ``(timestamp, payload)`` pairs with bounded memory, spilling sorted runs to temp files."""
+
+    _ENTRY_OVERHEAD = 100  # rough per-pair cost of the tuple, int and str headers
+
+    def __init__(self, max_bytes: int = SORT_BUFFER_MB * 1024 * 1024, spill_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._buf: List[Tuple[int, str]] = []
+        self._buf_bytes = 0
+        self._runs: List[IO[bytes]] = []
+        self._count = 0
+        self.sort_seconds = 0.0  # time spent sorting and spilling runs
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def spilled_runs(self) -> int:
+        return len(self._runs)
+
+    def add(self, ts: int, payload: str) -> None:
+        self._buf.append((ts, payload))
+        self._count += 1
+        self._buf_bytes += len(payload) + self._ENTRY_OVERHEAD
+        if self._buf_bytes >= self.max_bytes:
+            self._spill()
+
+    def _spill(self) -> None:
+        started = time.monotonic()
+        self._buf.sort(key=_BY_TS)
+        run = tempfile.TemporaryFile(buffering=1024 * 1024, prefix=f"{ADDON_NAME}_sort_", dir=self.spill_dir)
+        pack = _RUN_HEADER.pack
+        write = run.write
+        for ts, payload in self._buf:
+            data = payload.encode("utf-8")
+            write(pack(ts, len(data)))
+            write(data)
+        run.flush()
+        run.seek(0)
+        self._runs.append(run)
+        self._buf = []
+        self._buf_bytes = 0
+        self.sort_seconds += time.monotonic() - started
+
+    @staticmethod
+    def _read_run(run: IO[bytes]) -> Iterator[Tuple[int, str]]:
+        header_size = _RUN_HEADER.size
+        unpack = _RUN_HEADER.unpack
+        read = run.read
+        while True:
+            header = read(header_size)
+            if len(header) < header_size:
+                return
+            ts, length = unpack(header)
+            yield ts, read(length).decode("utf-8")
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        started = time.monotonic()
+        self._buf.sort(key=_BY_TS)
+        self.sort_seconds += time.monotonic() - started
+        if not self._runs:
+            return iter(self._buf)
+        return heapq.merge(*(self._read_run(r) for r in self._runs), self._buf, key=_BY_TS)
+
+    def close(self) -> None:
+        for run in self._runs:
+            try:
+                run.close()
+            except Exception:
+                pass
+        self._runs = []
+        self._buf = []
+
+
+# ------------------------- Dedupe index -------------------------
+
+DEDUPE_MAX_UNTIMED = 8000  # digests of untimestamped records kept, least recently seen dropped first
+DEDUPE_MAX_BOUNDARY = 1000
+_UNTIMED_DIGEST_BYTES = 12
+
+
+def _payload_digest(payload: str) -> bytes:
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+class DedupeIndex:
+    """Compact record of what was already written, persisted with the checkpoint.
+
+    Records at the boundary timestamp and untimestamped records are skipped only on an exact content match.
+    """
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        state = state if isinstance(state, dict) else {}
+        self._prev_ts: Optional[int] = state.get("boundary_ts")
+        self._prev_hashes = set(state.get("boundary") or ())
+        self._ts: Optional[int] = self._prev_ts
+        self._payloads: List[str] = []
+        self._untimed: "OrderedDict[bytes, None]" = OrderedDict()
+        try:
+            packed = base64.b64decode(state.get("untimed") or "")
+        except (TypeError, ValueError):
+            packed = b""
+        for i in range(0, len(packed) - _UNTIMED_DIGEST_BYTES + 1, _UNTIMED_DIGEST_BYTES):
+            self._untimed[packed[i:i + _UNTIMED_DIGEST_BYTES]] = None
+        self._untimed_state: Optional[str] = None  # encoded digests, reset when they change
+        self.skipped = 0
+
+    def seen(self, ts: Optional[int], payload: str) -> bool:
+        """True if this record was already written; otherwise remember it."""
+        if ts is None:
+            digest = _payload_digest(payload)[:_UNTIMED_DIGEST_BYTES]
+            self._untimed_state = None
+            if digest in self._untimed:
+                self._untimed.move_to_end(digest)
+                self.skipped += 1
+                return True
+            self._untimed[digest] = None
+            if len(self._untimed) > DEDUPE_MAX_UNTIMED:
+                self._untimed.popitem(last=False)
+            return False
+
+        if ts == self._prev_ts and self._prev_hashes and _payload_digest(payload).hex() in self._prev_hashes:
+            self.skipped += 1
+            return True
+        if self._ts is None or ts > self._ts:
+            self._ts = ts
+            self._payloads = [payload]
+        elif ts == self._ts and len(self._payloads) < DEDUPE_MAX_BOUNDARY:
+            self._payloads.append(payload)
+        return False
+
+    def to_state(self) -> Dict[str, Any]:
+        hashes = {_payload_digest(p).hex() for p in self._payloads}
+        if self._ts == self._prev_ts:
+            hashes |= self._prev_hashes
+        state: Dict[str, Any] = {"boundary_ts": self._ts, "boundary": sorted(hashes)[:DEDUPE_MAX_BOUNDARY]}
+        if self._untimed:
+            # Checkpoints are saved every batch; only re-encode after untimed records were seen.
+            if self._untimed_state is None:
+                self._untimed_state = base64.b64encode(b"".join(self._untimed)).decode("ascii")
+            state["untimed"] = self._untimed_state
+        return state
+
+
+# ------------------------- Auto-tuning -------------------------
+
+TUNE_TARGET_REQUEST_SEC = 10.0  # keep responses well under the 60s request timeout
+TUNE_MIN_PAGE_SIZE = 100
+TUNE_MAX_PAGE_SIZE = 10000
+TUNE_MIN_WINDOW_MS = 60 * 1000
+TUNE_MAX_WINDOW_MS = 24 * 3600 * 1000
+TUNE_INITIAL_WINDOW_MS = 3600 * 1000
+TUNE_WINDOW_PAGES = 10  # paged fetches aim for about this many pages per window
+TUNE_MAX_GROWTH = 4  # a window is never more than this many times the previous one
+_TUNE_ALPHA = 0.3  # weight of the newest observation in the moving averages
+_TUNE_MIN_SAMPLE = 100  # smaller responses say little about per-record cost
+
+
+def _clamp(value: float, lo: float, hi: float) -> float:
+    return max(lo, min(hi, value))
+
+
+def _ewma(previous: Optional[float], sample: float) -> float:
+    return sample if previous is None else previous + _TUNE_ALPHA * (sample - previous)
+
+
+class WindowTuner:
+    """Pick the fetch window span and page size of one input from observed traffic."""
+
+    def __init__(
+        self,
+        state: Optional[Dict[str, Any]] = None,
+        page_size: int = 1000,
+        paged: bool = False,
+        max_page_size: Optional[int] = None,
+    ):
+        state = state if isinstance(state, dict) else {}
+        self.paged = paged
+        self.max_page_size = max_page_size or TUNE_MAX_PAGE_SIZE
+        self._min_page_size = min(TUNE_MIN_PAGE_SIZE, self.max_page_size)
+        self.density: Optional[float] = None
+        self.sec_per_record: Optional[float] = None
+        self.page_size = int(_clamp(page_size, self._min_page_size, self.max_page_size))
+        self.window_ms = TUNE_INITIAL_WINDOW_MS
+        try:
+            if state.get("density") is not None:
+                self.density = max(0.0, float(state["density"]))
+            if state.get("sec_per_record"):
+                self.sec_per_record = float(state["sec_per_record"])
+            if state.get("page_size"):
+                self.page_size = int(_clamp(int(state["page_size"]), self._min_page_size, self.max_page_size))
+            if state.get("window_ms"):
+                self.window_ms = int(_clamp(int(state["window_ms"]), TUNE_MIN_WINDOW_MS, TUNE_MAX_WINDOW_MS))
+        except (TypeError, ValueError):
+            pass
+        self._lock = threading.Lock()
+
+    def window_end(self, start_ms: int, end_ms: int) -> int:
+        """End (inclusive) of the next window starting at ``start_ms``, never past ``end_ms``."""
+        return min(end_ms, start_ms + self.window_ms - 1)
+
+    def observe_response(self, records: int, elapsed_sec: float) -> None:
+        """Record one API response; may be called from several fetch threads."""
+        if records < _TUNE_MIN_SAMPLE:
+            return
+        with self._lock:
+            self.sec_per_record = _ewma(self.sec_per_record, elapsed_sec / records)
+            size = round(TUNE_TARGET_REQUEST_SEC / self.sec_per_record, -2)
+            self.page_size = int(_clamp(size, self._min_page_size, self.max_page_size))
+
+    def observe_window(self, span_ms: int, records: int) -> None:
+        """Record how many records a completed window of ``span_ms`` held."""
+        with self._lock:
+            self.density = _ewma(self.density, records / max(1, span_ms))
+            target = self.page_size * (TUNE_WINDOW_PAGES if self.paged else 1)
+            span = target / self.density if self.density > 0 else TUNE_MAX_WINDOW_MS
+            span = min(span, self.window_ms * TUNE_MAX_GROWTH)
+            self.window_ms = int(_clamp(span, TUNE_MIN_WINDOW_MS, TUNE_MAX_WINDOW_MS))
+
+    def on_truncated(self) -> None:
+        """A response hit the row cap: halve the window so the next one fits."""
+        with self._lock:
+            self.window_ms = int(max(TUNE_MIN_WINDOW_MS, self.window_ms // 2))
+
+    def on_timeout(self) -> None:
+        with self._lock:
+            self.window_ms = int(max(TUNE_MIN_WINDOW_MS, self.window_ms // 2))
+            self.page_size = int(max(self._min_page_size, self.page_size // 2))
+            if self.sec_per_record is not None:
+                self.sec_per_record *= 2
+
+    def to_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "density": None if self.density is None else round(self.density, 9),
+                "sec_per_record": None if self.sec_per_record is None else round(self.sec_per_record, 9),
+                "page_size": self.page_size,
+                "window_ms": self.window_ms,
+            }
+
+
+# ------------------------- Metrics -------------------------
+
+class PhaseMetrics:
+    """Time spent per phase and counters for one input run; safe to update from any thread."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.seconds: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.monotonic() - started)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus ``elapsed_sec`` and ``phase_sec`` (seconds per phase), rounded to µs."""
+        with self._lock:
+            return {
+                **self.counters,
+                "elapsed_sec": round(time.monotonic() - self._started, 6),
+                "phase_sec": {name: round(sec, 6) for name, sec in sorted(self.seconds.items())},
+            }
+
+
+# ------------------------- Concurrency -------------------------
+
+def to_positive_int(value: Any, default: int) -> int:
+    """Parse a conf value as an int >= 1, falling back to ``default``."""
+    try:
+        ival = int(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+    return ival if ival > 0 else default
+
+
+class SerializedEventWriter:
+    """Wrap an EventWriter so events from concurrent inputs are written one at a time."""
+
+    def __init__(self, event_writer: Any):
+        self._writer = event_writer
+        self._lock = threading.Lock()
+
+    def write_event(self, event: Any) -> None:
+        with self._lock:
+            self._writer.write_event(event)
+
+    def write_raw(self, chunk: str) -> None:
+        with self._lock:
+            write_raw_events(self._writer, chunk)
+
+    def log(self, severity: str, message: str) -> None:
+        with self._lock:
+            self._writer.log(severity, message)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._writer, name)
+
+
+class ConcurrencyLimiter:
+    """Per-key semaphores, e.g. to cap how many inputs of one account run at once."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+
+    @contextmanager
+    def hold(self, key: str, limit: Any) -> Iterator[None]:
+        """Hold one slot for ``key``; a missing or non-positive ``limit`` means unlimited.
+
+        The limit seen on first use of a key is kept for the life of the limiter.
+        """
+        max_slots = to_positive_int(limit, 0)
+        with self._lock:
+            sem = self._slots.get(key)
+            if sem is None and max_slots:
+                sem = self._slots[key] = threading.BoundedSemaphore(max_slots)
+        if sem is None:
+            yield
+            return
+        sem.acquire()
+        try:
+            yield
+        finally:
+            sem.release()
+
+
+class IntervalScheduler:
+    """Run keyed jobs on their own intervals from a bounded worker pool; a job never overlaps itself."""
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "apigee_sched"):
+        self._max_workers = max(1, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix=thread_name_prefix)
+        self._cond = threading.Condition()
+        self._jobs: Dict[str, Tuple[float, Callable[[], None]]] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._due: Dict[str, float] = {}
+        self._running: Set[str] = set()
+        self._seq = itertools.count()
+
+    def _push(self, key: str, due: float) -> None:
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._seq), key))
+
+    def set_jobs(self, jobs: Dict[str, Tuple[float, Callable[[], None]]]) -> None:
+        """Replace the jobs (key -> (interval seconds, callable)); new keys are due now."""
+        with self._cond:
+            self._jobs = dict(jobs)
+            now = time.monotonic()
+            for key in self._jobs:
+                if key not in self._due and key not in self._running:
+                    self._push(key, now)
+            self._cond.notify_all()
+
+    def run_until(self, deadline: float, stop: threading.Event) -> None:
+        """Start due jobs until the monotonic ``deadline`` passes or ``stop`` is set."""
+        with self._cond:
+            while not stop.is_set():
+                now = time.monotonic()
+                if now >= deadline:
+                    return
+                while self._heap and self._heap[0][0] <= now and len(self._running) < self._max_workers:
+                    due, _, key = heapq.heappop(self._heap)
+                    if self._due.get(key) != due:
+                        continue  # superseded entry
+                    del self._due[key]
+                    job = self._jobs.get(key)
+                    if job is None:
+                        continue  # removed since it was scheduled
+                    self._running.add(key)
+                    self._pool.submit(self._run, key, job[1], now)
+                timeout = deadline - now
+                if self._heap and len(self._running) < self._max_workers:
+                    timeout = min(timeout, self._heap[0][0] - now)
+                # Short waits keep a signal-driven ``stop`` responsive.
+                self._cond.wait(min(max(timeout, 0.0), 1.0))
+
+    def _run(self, key: str, fn: Callable[[], None], started: float) -> None:
+        try:
+            fn()
+        except Exception as ex:
+            _utils_logger().error("Scheduled job %s failed: %s", key, ex)
+        finally:
+            with self._cond:
+                self._running.discard(key)
+                job = self._jobs.get(key)
+                if job is not None:
+                    self._push(key, max(started + job[0], time.monotonic()))
+                self._cond.notify_all()
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """Stop scheduling and wait up to ``timeout`` seconds for running jobs; True if none are left."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._jobs = {}
+            while self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            idle = not self._running
+        self._pool.shutdown(wait=False)
+        return idle
+
+
+def iter_in_background(iterable: Iterable[Any], max_pending: int = 2, name: str = "apigee_prefetch") -> Iterator[Any]:
+    """Drain ``iterable`` on a daemon thread and yield its items through a bounded queue."""
+    pending: "queue.Queue[Tuple[bool, Any]]" = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    def _put(item: Tuple[bool, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in iterable:
+                if not _put((True, item)):
+                    return
+        except BaseException as ex:  # noqa: B036 - handed to the consumer
+            _put((False, ex))
+            return
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+        _put((False, None))
+
+    threading.Thread(target=_produce, name=name, daemon=True).start()
+    try:
+        while True:
+            ok, item = pending.get()
+            if ok:
+                yield item
+            elif item is not None:
+                raise item
+            else:
+                return
+    finally:
+        stop.set()
+
+
 __all__ = [
     "ADDON_NAME",
     "CHECKPOINTER_COLLECTION",
+    "SETTINGS_CONF",
+    "ACCOUNT_CONF",
+    "IMPORT_PROFILE_ENV",
+    "lazy_import",
+    "import_profile_report",
+    "ConfCache",
+    "get_conf_stanzas",
+    "invalidate_conf_cache",
     "get_log_level",
     "set_logger",
     "get_proxy_settings",
@@ -381,10 +2721,49 @@ __all__ = [
     "now_ms",
     "validate_start_date",
     "extract_timestamp_from_event",
+    "TimestampExtractor",
+    "compile_timestamp_extractor",
+    "RawRecord",
+    "RawRecordScanner",
+    "compile_record_scanner",
+    "PARSE_PARALLEL_MIN_BYTES",
+    "ParallelParser",
+    "RecordFilter",
+    "compile_record_filter",
     "build_cert_files",
+    "clear_cert_cache",
+    "get_client_ssl_context",
     "cleanup_temp_files",
+    "get_http_session",
+    "close_http_sessions",
+    "AdaptiveRateLimiter",
+    "get_rate_limiter",
+    "parse_retry_after",
     "http_get_with_retry",
     "get_checkpoint_manager",
+    "CheckpointStore",
+    "get_checkpoint_store",
     "get_last_checkpoint_time",
+    "get_checkpoint_state",
     "update_checkpoint",
+    "LEASE_TTL_SEC",
+    "LeaseCoordinator",
+    "DedupeIndex",
+    "WindowTuner",
+    "PhaseMetrics",
+    "to_positive_int",
+    "EVENT_BATCH_SIZE",
+    "make_json_encoder",
+    "write_raw_events",
+    "BatchEventWriter",
+    "HecError",
+    "HecEventWriter",
+    "HecSink",
+    "get_hec_sink",
+    "SORT_BUFFER_MB",
+    "ExternalSorter",
+    "SerializedEventWriter",
+    "ConcurrencyLimiter",
+    "IntervalScheduler",
+    "iter_in_background",
 ]